@@ -0,0 +1,5 @@
+# -*- coding: utf-8 -*-
+"""
+@author: rwang
+"""
+# Kept at the top of the repository so pytest puts it on sys.path and the tests can import stock_analysis
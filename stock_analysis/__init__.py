@@ -0,0 +1,8 @@
+# -*- coding: utf-8 -*-
+"""
+@author: rwang
+
+Stock analysis functions for the {ticker-name}.csv files. Importing the package only imports the
+standard library; every module imports numpy and pandas, and matplotlib and scipy are imported on
+first use. Run `python -m stock_analysis --help` for the command line.
+"""
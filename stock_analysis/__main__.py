@@ -0,0 +1,8 @@
+# -*- coding: utf-8 -*-
+"""
+@author: rwang
+"""
+from .cli import main
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,356 @@
+# -*- coding: utf-8 -*-
+"""
+@author: rwang
+"""
+import argparse
+import json
+import multiprocessing
+import os
+import platform
+import queue
+import subprocess
+import sys
+import tempfile
+import time
+import tracemalloc
+import numpy as np
+import pandas as pd
+from .cli import commands
+from .instrumentation import peak_rss_mb
+
+# This file times every analysis function on synthetic data in the WMT.csv schema for a range of
+# row and ticker counts. Every case runs in a fresh process so its peak RSS is its own, and the
+# report is a json file that can be compared with the report of another commit.
+
+default_rows = [1000, 10000, 100000, 1000000]
+default_tickers = [1, 10, 100]
+# Modules behind the non-plotting commands, a cold import of these must not pull in matplotlib
+import_budget_modules = [module for name, (module, _) in commands.items() if name != 'plot']
+
+
+def synthetic_ohlcv(rows, tickers=1, seed=0):
+    """
+    rows: int. Total number of daily rows, split evenly over the tickers
+    tickers: int. Number of tickers
+    seed: int. Seed of the random prices
+    returns: df in the WMT.csv schema with a Ticker column, sorted by ticker and date
+    """
+    random = np.random.default_rng(seed)
+    days = max(rows // tickers, 1)
+    dates = pd.bdate_range('1990-01-01', periods=days)
+    returns = random.normal(0.0003, 0.012, (tickers, days))
+    returns[:, 0] = 0
+    adj_close = 50 * np.exp(np.cumsum(np.log1p(returns), axis=1))
+    close = np.round(adj_close * 1.1, 2)
+    open_price = np.round(close * (1 + random.normal(0, 0.004, close.shape)), 2)
+    high = np.round(np.maximum(open_price, close) * (1 + np.abs(random.normal(0, 0.003, close.shape))), 2)
+    low = np.round(np.minimum(open_price, close) * (1 - np.abs(random.normal(0, 0.003, close.shape))), 2)
+
+    # Weeks start on Sunday like the csv files (strftime %U) and ingestion.add_schema_columns
+    sunday_weekday = (dates.dayofweek.to_numpy() + 1) % 7
+    week_number = ((dates.dayofyear.to_numpy() - 1 - sunday_weekday + 7) // 7).astype('int64')
+    df = pd.DataFrame({
+        'Ticker': np.repeat(['T{:05d}'.format(index) for index in range(tickers)], days),
+        'Date': np.tile(dates.to_numpy(), tickers),
+        'Year': np.tile(dates.year.to_numpy(), tickers),
+        'Month': np.tile(dates.month.to_numpy(), tickers),
+        'Day': np.tile(dates.day.to_numpy(), tickers),
+        'Weekday': np.tile(dates.day_name().to_numpy(), tickers),
+        'Week_Number': np.tile(week_number, tickers),
+        'Year_Week': np.tile(dates.year.astype(str).to_numpy() + '-' + np.char.zfill(week_number.astype(str), 2), tickers),
+        'Open': open_price.ravel(), 'High': high.ravel(), 'Low': low.ravel(), 'Close': close.ravel(),
+        'Volume': random.integers(1000000, 20000000, tickers * days).astype('float64'),
+        'Adj Close': np.round(adj_close, 2).ravel(), 'Return': returns.ravel()})
+    # The csv files carry 14 and 50 day moving averages of the close
+    from .rolling_statistics import add_moving_averages
+    return add_moving_averages(df)
+
+
+def setup_weekly_return_volatility(df, work_dir):
+    from .weekly_return_volatility import weekly_return_volatility
+    return lambda: weekly_return_volatility(df)
+
+
+def setup_weekly_return_volatility_chunked(df, work_dir):
+    from .weekly_return_volatility import weekly_return_volatility_chunked
+    ticker_file = os.path.join(work_dir, 'prices.csv')
+    df.drop(columns=['Ticker']).to_csv(ticker_file, index=False)
+    return lambda: weekly_return_volatility_chunked(ticker_file, chunksize=100000)
+
+
+def setup_yearly_return_tables(df, work_dir):
+    from .normality_returns import create_yearly_return_tables
+    return lambda: create_yearly_return_tables(df)
+
+
+def setup_last_digit_errors(df, work_dir):
+    from .last_digit_open_price import count_digits_by, digit_error_table
+    return lambda: digit_error_table(count_digits_by(df, ['Ticker', 'Year']))
+
+
+def setup_load_ticker_csv(df, work_dir):
+    from .loader import load_ticker_csv
+    ticker_file = os.path.join(work_dir, 'prices.csv')
+    df.drop(columns=['Ticker']).to_csv(ticker_file, index=False)
+    # Build the cache first so the case times the repeat run
+    load_ticker_csv(ticker_file)
+    return lambda: load_ticker_csv(ticker_file)
+
+
+def setup_price_store_get(df, work_dir):
+    from .price_store import build_price_store, PriceStore
+    ticker_files = []
+    for ticker, df_ticker in df.groupby('Ticker'):
+        ticker_files.append(os.path.join(work_dir, ticker + '.csv'))
+        df_ticker.drop(columns=['Ticker']).to_csv(ticker_files[-1], index=False)
+    build_price_store(ticker_files, os.path.join(work_dir, 'store'))
+    store = PriceStore(os.path.join(work_dir, 'store'))
+    start_date, end_date = df['Date'].quantile([0.25, 0.75])
+    return lambda: [store.get(ticker, start_date, end_date) for ticker in store.tickers]
+
+
+def setup_rolling_statistics(df, work_dir):
+    from .rolling_statistics import add_rolling_statistics
+    return lambda: add_rolling_statistics(df, window=20)
+
+
+def setup_normality_tests(df, work_dir):
+    from .normal_distribution import normality_tests
+    return lambda: normality_tests(df)
+
+
+def setup_week_labels(df, work_dir):
+    from .week_labeler import weekly_features, label_weeks_by_rule, broadcast_week_labels
+    def run():
+        features = weekly_features(df)
+        return broadcast_week_labels(df, features, label_weeks_by_rule(features))
+    return run
+
+
+def setup_backtest(df, work_dir):
+    from .label_backtester import backtest, daily_adj_close_returns
+    group_ids = pd.factorize(df['Ticker'])[0]
+    returns = daily_adj_close_returns(df)
+    positions = np.random.default_rng(0).random((10, len(df))) < 0.5
+    return lambda: backtest(returns, positions, group_ids)
+
+
+def setup_render_week_page(df, work_dir):
+    from .plot_weekly_data_for_labeling import render_week_page, plot_columns
+    df_week = df.iloc[:5].assign(Date=df['Date'].iloc[:5].dt.strftime('%m/%d/%Y'))[plot_columns]
+    return lambda: render_week_page('T00000', df_week)
+
+
+# Case name: (setup function, takes more than one ticker, largest number of rows it is run for)
+cases = {
+    'weekly_return_volatility': (setup_weekly_return_volatility, False, None),
+    'weekly_return_volatility_chunked': (setup_weekly_return_volatility_chunked, False, None),
+    'create_yearly_return_tables': (setup_yearly_return_tables, False, None),
+    'last_digit_errors': (setup_last_digit_errors, True, None),
+    'load_ticker_csv': (setup_load_ticker_csv, False, None),
+    'price_store_get': (setup_price_store_get, True, None),
+    'add_rolling_statistics': (setup_rolling_statistics, True, None),
+    'normality_tests': (setup_normality_tests, True, None),
+    'week_labels': (setup_week_labels, True, None),
+    'backtest': (setup_backtest, True, None),
+    'render_week_page': (setup_render_week_page, False, 1000),
+}
+
+
+def run_case(name, rows, tickers, repeat, result_queue):
+    """
+    name: string. Name of the case in cases
+    rows: int. Total number of synthetic rows
+    tickers: int. Number of synthetic tickers
+    repeat: int. Number of timed runs, the fastest one is reported
+    result_queue: multiprocessing queue the result dict is put on
+    """
+    try:
+        setup, _, _ = cases[name]
+        df = synthetic_ohlcv(rows, tickers)
+        with tempfile.TemporaryDirectory() as work_dir:
+            function = setup(df, work_dir)
+            rss_before = peak_rss_mb()
+            seconds = []
+            for _ in range(repeat):
+                start = time.perf_counter()
+                function()
+                seconds.append(time.perf_counter() - start)
+            peak_rss = peak_rss_mb()
+            # A separate run under tracemalloc, tracing slows the function down too much to time it
+            tracemalloc.start()
+            function()
+            _, peak_allocated = tracemalloc.get_traced_memory()
+            tracemalloc.stop()
+        result_queue.put({'case': name, 'rows': len(df), 'tickers': tickers, 'seconds': min(seconds),
+            'rows_per_second': len(df) / min(seconds) if min(seconds) > 0 else None,
+            'peak_rss_mb': peak_rss, 'rss_growth_mb': None if peak_rss is None or rss_before is None else peak_rss - rss_before,
+            'peak_allocated_mb': peak_allocated / 2 ** 20})
+    except Exception as e:
+        result_queue.put({'case': name, 'rows': rows, 'tickers': tickers, 'error': '{}: {}'.format(type(e).__name__, e)})
+
+
+def wait_for_result(process, result_queue, name, rows, tickers, poll_seconds=1.0):
+    """
+    process: multiprocessing process running run_case
+    result_queue: multiprocessing queue the case puts its result on
+    name: string. Name of the case
+    rows: int. Total number of synthetic rows
+    tickers: int. Number of synthetic tickers
+    poll_seconds: float. How often to check that the process is still running
+    returns: the result dict of the case, or an error result when the process died without one, eg. killed when out of memory
+    """
+    while True:
+        try:
+            return result_queue.get(timeout=poll_seconds)
+        except queue.Empty:
+            if process.is_alive():
+                continue
+        # The result may have been put just before the process ended
+        try:
+            return result_queue.get(timeout=poll_seconds)
+        except queue.Empty:
+            process.join()
+            return {'case': name, 'rows': rows, 'tickers': tickers, 'error': 'case process exited with code {}'.format(process.exitcode)}
+
+
+def run_benchmarks(case_names, rows_list, tickers_list, repeat=3):
+    """
+    case_names: list of case names
+    rows_list: list of total row counts
+    tickers_list: list of ticker counts
+    repeat: int. Number of timed runs of every case, the fastest one is reported
+    returns: list of result dicts, one per case, row count and ticker count
+    """
+    context = multiprocessing.get_context('spawn')
+    results = []
+    for name in case_names:
+        _, multi_ticker, max_rows = cases[name]
+        for rows in rows_list:
+            for tickers in (tickers_list if multi_ticker else [1]):
+                if rows // tickers < 5 or (max_rows is not None and rows > max_rows):
+                    continue
+                result_queue = context.Queue()
+                process = context.Process(target=run_case, args=(name, rows, tickers, repeat, result_queue))
+                process.start()
+                result = wait_for_result(process, result_queue, name, rows, tickers)
+                process.join()
+                results.append(result)
+                print(format_result(result))
+    return results
+
+
+def format_result(result):
+    """
+    result: dict as returned by run_case
+    returns: string with one line describing the result
+    """
+    if 'error' in result:
+        return '{:<34} rows={:<10} tickers={:<6} failed: {}'.format(result['case'], result['rows'], result['tickers'], result['error'])
+    return '{:<34} rows={:<10} tickers={:<6} {:>10.4f} s  peak rss {:>8.1f} MB  allocated {:>8.1f} MB'.format(
+        result['case'], result['rows'], result['tickers'], result['seconds'],
+        float('nan') if result['peak_rss_mb'] is None else result['peak_rss_mb'], result['peak_allocated_mb'])
+
+
+def environment():
+    """
+    returns: dict describing the commit and library versions the report was made with
+    """
+    try:
+        commit = subprocess.run(['git', 'rev-parse', 'HEAD'], capture_output=True, text=True,
+            cwd=os.path.dirname(os.path.abspath(__file__))).stdout.strip() or None
+    except OSError:
+        commit = None
+    return {'commit': commit, 'python': platform.python_version(), 'numpy': np.__version__, 'pandas': pd.__version__,
+        'platform': platform.platform(), 'cpus': os.cpu_count(), 'time': time.strftime('%Y-%m-%dT%H:%M:%S')}
+
+
+def measure_cold_imports(modules=import_budget_modules):
+    """
+    modules: list of module names in this package
+    returns: list of dicts with the seconds a fresh interpreter takes to import the cli and the module,
+        and whether matplotlib or scipy ended up imported
+    """
+    package_dir = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+    results = []
+    for module in modules:
+        code = ('import sys, time, json; start = time.perf_counter(); import {0}.cli, {0}.{1}; '
+            'print(json.dumps({{"seconds": time.perf_counter() - start, '
+            '"matplotlib": "matplotlib" in sys.modules, "scipy": "scipy" in sys.modules}}))').format(__package__, module)
+        output = subprocess.run([sys.executable, '-c', code], capture_output=True, text=True, cwd=package_dir, check=True).stdout
+        results.append(dict(json.loads(output), module=module))
+    return results
+
+
+def check_import_budget(import_results, budget):
+    """
+    import_results: list of dicts as returned by measure_cold_imports
+    budget: float. Most seconds a cold import may take
+    returns: list of strings describing every module over budget or importing matplotlib
+    """
+    problems = []
+    for result in import_results:
+        if result['seconds'] > budget:
+            problems.append('{} takes {:.3f} s to import, the budget is {:.3f} s'.format(result['module'], result['seconds'], budget))
+        if result['matplotlib']:
+            problems.append('{} imports matplotlib'.format(result['module']))
+    return problems
+
+
+def compare_reports(baseline, current, threshold=1.2):
+    """
+    baseline: dict. Report of an earlier run
+    current: dict. Report of this run
+    threshold: float. Slowdown ratio above which a case counts as a regression
+    returns: df with the baseline and current seconds and their ratio for every case in both reports
+    """
+    def by_key(report):
+        return {(result['case'], result['rows'], result['tickers']): result['seconds'] for result in report['results'] if 'error' not in result}
+    baseline_seconds = by_key(baseline)
+    current_seconds = by_key(current)
+    rows = [{'Case': key[0], 'Rows': key[1], 'Tickers': key[2], 'Baseline Seconds': baseline_seconds[key], 'Seconds': current_seconds[key],
+        'Ratio': current_seconds[key] / baseline_seconds[key]} for key in sorted(baseline_seconds.keys() & current_seconds.keys())]
+    comparison = pd.DataFrame(rows, columns=['Case', 'Rows', 'Tickers', 'Baseline Seconds', 'Seconds', 'Ratio'])
+    comparison['Regression'] = comparison['Ratio'] > threshold
+    return comparison
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description='Benchmark the analysis functions on synthetic data.')
+    parser.add_argument('--cases', nargs='+', default=list(cases), choices=list(cases), help='cases to run, defaults to all')
+    parser.add_argument('--rows', nargs='+', type=int, default=default_rows, help='total synthetic rows, eg. 1000 10000 100000000')
+    parser.add_argument('--tickers', nargs='+', type=int, default=default_tickers, help='synthetic ticker counts, eg. 1 100 10000')
+    parser.add_argument('--repeat', type=int, default=3, help='timed runs per case, the fastest one is reported')
+    parser.add_argument('--output', default='benchmark_report.json', help='json report to write')
+    parser.add_argument('--compare', default=None, help='json report of an earlier run to compare with')
+    parser.add_argument('--threshold', type=float, default=1.2, help='slowdown ratio reported as a regression')
+    parser.add_argument('--import-budget', type=float, default=None,
+        help='fail when a cold import of a non-plotting command takes more seconds than this or imports matplotlib')
+    args = parser.parse_args(argv)
+
+    import_results = measure_cold_imports()
+    for result in import_results:
+        print('import {:<30} {:>10.4f} s  matplotlib {}  scipy {}'.format(result['module'], result['seconds'], result['matplotlib'], result['scipy']))
+    if args.import_budget is not None:
+        problems = check_import_budget(import_results, args.import_budget)
+        if problems:
+            print('\n'.join(problems))
+            raise SystemExit(1)
+
+    report = {'environment': environment(), 'imports': import_results,
+        'results': run_benchmarks(args.cases, args.rows, args.tickers, args.repeat)}
+    with open(args.output, 'w') as f:
+        json.dump(report, f, indent=2)
+    print('Wrote {}'.format(args.output))
+
+    if args.compare:
+        with open(args.compare) as f:
+            comparison = compare_reports(json.load(f), report, args.threshold)
+        print(comparison.to_string(index=False))
+        if comparison['Regression'].any():
+            print('{} cases are more than {}x slower than {}'.format(comparison['Regression'].sum(), args.threshold, args.compare))
+            raise SystemExit(1)
+
+
+if __name__ == "__main__":
+    main()
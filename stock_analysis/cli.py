@@ -0,0 +1,49 @@
+# -*- coding: utf-8 -*-
+"""
+@author: rwang
+"""
+import argparse
+import importlib
+from . import instrumentation
+
+# Command name: (module in this package, help). The module is only imported once its command is
+# chosen, so a non-plotting command never imports matplotlib.
+commands = {
+    'digits': ('last_digit_open_price', 'last digit frequencies of the open price and their errors'),
+    'digit-significance': ('digit_significance', 'Monte Carlo p-values of the last digit errors'),
+    'normality': ('normality_returns', 'yearly positive/negative days, mu split and 2 sigma tail tables'),
+    'normality-tests': ('normal_distribution', 'normality tests for every year and the 2018 returns plot'),
+    'weekly-vol': ('weekly_return_volatility', 'weekly mean return and volatility csv'),
+    'weekly-corr': ('weekly_correlation', 'weekly return/volatility correlation across tickers and volatility regimes'),
+    'resample': ('resample', 'weekly, monthly, quarterly, yearly or N day bars and return statistics'),
+    'plot': ('plot_weekly_data_for_labeling', 'weekly volume and close price pdf for labeling'),
+    'labels': ('week_labeler', 'GREEN/RED week labels compared with the hand labels'),
+    'backtest': ('label_backtester', 'backtest of the week label strategies'),
+    'ingest': ('ingestion', 'concurrent price download into ticker csv or parquet files'),
+    'pipeline': ('pipeline', 'all analyses for many ticker csv files'),
+    'benchmark': ('benchmark', 'timings of the analysis functions on synthetic data'),
+}
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(prog='python -m stock_analysis', description='Stock analysis commands.',
+        epilog='\n'.join('{:<16} {}'.format(name, description) for name, (_, description) in commands.items()),
+        formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--trace', metavar='LOG', help='append json lines with the time, rows and memory of every stage to LOG')
+    parser.add_argument('--profile', metavar='FILE', help='profile the whole command into FILE')
+    parser.add_argument('--profiler', choices=['cprofile', 'pyinstrument'], default='cprofile',
+        help='cprofile writes a pstats dump, pyinstrument an html report')
+    parser.add_argument('command', choices=list(commands), metavar='command', help='one of the commands below')
+    parser.add_argument('args', nargs=argparse.REMAINDER, help='arguments of the command, see <command> --help')
+    args = parser.parse_args(argv)
+    if args.trace:
+        instrumentation.enable(args.trace)
+    module = importlib.import_module('.' + commands[args.command][0], __package__)
+    if args.profile:
+        with instrumentation.capture_profile(args.profile, args.profiler):
+            return module.main(args.args)
+    return module.main(args.args)
+
+
+if __name__ == "__main__":
+    main()
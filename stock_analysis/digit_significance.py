@@ -0,0 +1,141 @@
+# -*- coding: utf-8 -*-
+"""
+@author: rwang
+"""
+import argparse
+import os
+from concurrent.futures import ProcessPoolExecutor
+import numpy as np
+import pandas as pd
+from .loader import load_ticker_csv
+from .last_digit_open_price import count_digits_by
+
+# This file tests whether the last digit counts of the open price could come from a uniform distribution.
+# For every (ticker, year) it draws many uniform multinomial samples of the same size and compares the
+# observed max, median, mean and root mean squared errors and chi-square statistic with those draws.
+# The draws are split into chunks of draws and blocks of groups, so every (draws x groups x digits) array
+# stays under a cell budget however many tickers and years there are. Every chunk has its own seed taken
+# from the main seed, so the p-values are the same with or without worker processes.
+
+ticker='WMT'
+ticker_file = os.path.join('./' + ticker + '.csv')
+metric_names = ['Max Absolute Error', 'Median Absolute Error', 'Mean Absolute Error', 'Root Mean Squared Error', 'Chi Square']
+# Relative slack so a draw that ties the observed statistic still counts despite float rounding
+tie_tolerance = 1e-9
+# Cells of the (draws x groups x digits) array simulated at once, 2 ** 22 int64 counts are 32 MB
+max_cells = 2 ** 22
+
+
+def digit_error_metrics(counts):
+    """
+    counts: numpy array. Digit counts with the 10 digits on the last axis, eg. (groups x 10) or (draws x groups x 10)
+    returns: numpy array with the 5 metrics of metric_names on the last axis, unrounded
+    """
+    counts = np.asarray(counts, dtype='float64')
+    sample_sizes = np.sum(counts, axis=-1, keepdims=True)
+    abs_vector_diff = np.abs(counts / sample_sizes - 0.1)
+    expected = sample_sizes * 0.1
+    return np.stack([np.max(abs_vector_diff, axis=-1),
+        np.median(abs_vector_diff, axis=-1),
+        np.mean(abs_vector_diff, axis=-1),
+        np.sqrt(np.mean(np.square(abs_vector_diff), axis=-1)),
+        np.sum(np.square(counts - expected) / expected, axis=-1)], axis=-1)
+
+
+def simulate_chunk(sample_sizes, observed_metrics, draws, seed_sequence, return_null=False):
+    """
+    sample_sizes: numpy array. Number of days of every group
+    observed_metrics: numpy array. (groups x 5) observed metrics
+    draws: int. Number of uniform samples per group in this chunk
+    seed_sequence: np.random.SeedSequence. Seed of this chunk
+    return_null: bool. Also return the metrics of every draw
+    returns: Tuple of the (groups x 5) number of draws at least as extreme as observed and the
+        (draws x groups x 5) float32 null metrics or None
+    """
+    rng = np.random.default_rng(seed_sequence)
+    # One multinomial per (draw, group), the sample size broadcasts over the draws
+    null_counts = rng.multinomial(sample_sizes, np.full(10, 0.1), size=(draws, len(sample_sizes)))
+    null_metrics = digit_error_metrics(null_counts)
+    exceedances = np.sum(null_metrics >= observed_metrics * (1 - tie_tolerance), axis=0)
+    return exceedances, null_metrics.astype('float32') if return_null else None
+
+
+def simulate_chunk_star(arguments):
+    return simulate_chunk(*arguments)
+
+
+def digit_uniformity_test(digit_counts, draws=10000, chunk_size=2000, seed=None, workers=1, return_null=False, cells=max_cells):
+    """
+    digit_counts: df of digit counts with one row per group, as returned by count_digits_by
+    draws: int. Number of uniform samples per group
+    chunk_size: int. Most draws simulated at once
+    seed: int/None. Seed for reproducible p-values
+    workers: int/None. Number of worker processes, 1 simulates in this process, None uses every cpu
+    return_null: bool. Also return the null distributions
+    cells: int. Most (draws x groups x digits) cells simulated at once, the groups are split into blocks to stay under it
+    returns: df with the observed metrics and their p-values for every group, and when return_null is set
+        a dict of metric name: (draws x groups) null distribution
+    """
+    counts = np.asarray(digit_counts, dtype='int64')
+    sample_sizes = counts.sum(axis=1)
+    observed_metrics = digit_error_metrics(counts)
+    chunk_size = max(1, min(chunk_size, draws, cells // 10))
+    group_block = max(1, cells // (chunk_size * 10))
+    chunk_draws = [min(chunk_size, draws - start) for start in range(0, draws, chunk_size)]
+    group_starts = range(0, len(sample_sizes), group_block)
+    seeds = np.random.SeedSequence(seed).spawn(len(chunk_draws) * len(group_starts))
+    # One task per (chunk of draws, block of groups), draw chunk by draw chunk
+    tasks = [(chunk, slice(start, start + group_block)) for chunk in chunk_draws for start in group_starts]
+    arguments = [(sample_sizes[groups], observed_metrics[groups], chunk, chunk_seed, return_null)
+        for (chunk, groups), chunk_seed in zip(tasks, seeds)]
+    if workers == 1 or len(arguments) == 1:
+        results = map(simulate_chunk_star, arguments)
+    else:
+        executor = ProcessPoolExecutor(max_workers=workers)
+        results = executor.map(simulate_chunk_star, arguments)
+
+    exceedances = np.zeros(observed_metrics.shape, dtype='int64')
+    null_chunks = []
+    for (_, groups), (chunk_exceedances, chunk_null) in zip(tasks, results):
+        exceedances[groups] += chunk_exceedances
+        if return_null:
+            null_chunks.append(chunk_null)
+    if workers != 1 and len(arguments) > 1:
+        executor.shutdown()
+
+    # The observed sample counts as one of the draws, so a p-value is never 0
+    p_values = (exceedances + 1) / (draws + 1)
+    table = pd.DataFrame(np.column_stack([sample_sizes, observed_metrics, p_values]), index=digit_counts.index,
+        columns=['Days'] + metric_names + [name + ' p-value' for name in metric_names])
+    table['Days'] = table['Days'].astype('int64')
+    if not return_null:
+        return table
+    # The blocks of groups of a draw chunk are next to each other
+    blocks = len(group_starts)
+    null_metrics = np.concatenate([np.concatenate(null_chunks[start:start + blocks], axis=1) for start in range(0, len(null_chunks), blocks)])
+    return table, {name: null_metrics[:, :, index] for index, name in enumerate(metric_names)}
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description='Monte Carlo p-values of the last digit errors against a uniform distribution.')
+    parser.add_argument('ticker_files', nargs='*', default=[ticker_file], help='ticker csv files, defaults to %(default)s')
+    parser.add_argument('--draws', type=int, default=10000, help='uniform samples per (ticker, year), defaults to %(default)s')
+    parser.add_argument('--chunk-size', type=int, default=2000, help='most draws simulated at once')
+    parser.add_argument('--max-cells', type=int, default=max_cells, help='most draws x groups x digits cells simulated at once, caps the memory')
+    parser.add_argument('--workers', type=int, default=1, help='number of worker processes, 0 uses every cpu')
+    parser.add_argument('--seed', type=int, default=None, help='seed for reproducible p-values')
+    args = parser.parse_args(argv)
+
+    frames = []
+    for path in args.ticker_files:
+        df = load_ticker_csv(path)
+        frames.append(df.assign(Ticker=os.path.splitext(os.path.basename(path))[0]))
+    digit_counts = count_digits_by(pd.concat(frames, ignore_index=True), ['Ticker', 'Year'])
+    table = digit_uniformity_test(digit_counts, args.draws, args.chunk_size, args.seed, args.workers or None, cells=args.max_cells)
+    with pd.option_context('display.width', 200, 'display.max_columns', None):
+        print('Observed errors against 10% per digit and the share of {} uniform samples at least as large'.format(args.draws))
+        print(table.round(5))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,365 @@
+# -*- coding: utf-8 -*-
+"""
+@author: rwang
+"""
+import argparse
+import asyncio
+import http.client
+import io
+import os
+import threading
+import time
+import urllib.parse
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+import numpy as np
+import pandas as pd
+from .loader import normalize_schema
+from .rolling_statistics import add_moving_averages, ticker_date_order
+
+# This file downloads the daily prices of many tickers at once and turns them into {ticker-name}.csv files
+# in the WMT.csv schema (or Parquet files in the loader's schema). A source only has to return the raw
+# Date/Open/High/Low/Close/Volume/Adj Close columns; the calendar, Return and moving average columns are
+# derived afterwards for all tickers together. LocalFileSource and the stub HTTP server in this file let
+# everything run without a network.
+
+price_columns = ['Date', 'Open', 'High', 'Low', 'Close', 'Volume', 'Adj Close']
+schema_columns = ['Date', 'Year', 'Month', 'Day', 'Weekday', 'Week_Number', 'Year_Week', 'Open', 'High', 'Low',
+    'Close', 'Volume', 'Adj Close', 'Return', 'Short_MA', 'Long_MA']
+
+
+class TickerNotFoundError(LookupError):
+    """
+    Raised by a source when it has no prices for a ticker, this is not retried
+    """
+
+
+class PriceSource:
+    """
+    Interface of a price source. fetch returns a df with the price_columns of one ticker between two dates.
+    open and close are called once around a whole ingestion, so connections can be kept for every ticker.
+    """
+
+    async def open(self):
+        pass
+
+    async def close(self):
+        pass
+
+    async def fetch(self, ticker, start_date=None, end_date=None):
+        raise NotImplementedError
+
+    async def __aenter__(self):
+        await self.open()
+        return self
+
+    async def __aexit__(self, *exc_info):
+        await self.close()
+
+
+def select_price_rows(df, start_date=None, end_date=None):
+    """
+    df: pd dataframe. Prices with at least the price_columns
+    start_date: string/None. First date to keep, eg. 2014-01-01
+    end_date: string/None. Last date to keep, eg. 2018-12-31
+    returns: df with only the price_columns and the rows between the two dates
+    """
+    df = df[price_columns]
+    dates = df['Date'].astype(str)
+    keep = np.ones(len(df), dtype=bool)
+    if start_date is not None:
+        keep &= (dates >= start_date).to_numpy()
+    if end_date is not None:
+        keep &= (dates <= end_date).to_numpy()
+    return df.loc[keep].reset_index(drop=True)
+
+
+class LocalFileSource(PriceSource):
+    """
+    Reads {directory}/{ticker}.csv, any csv with the price_columns works, eg. the WMT.csv in this repo
+    """
+
+    def __init__(self, directory='.'):
+        self.directory = directory
+
+    async def fetch(self, ticker, start_date=None, end_date=None):
+        path = os.path.join(self.directory, ticker + '.csv')
+        if not os.path.exists(path):
+            raise TickerNotFoundError('no prices for {} in {}'.format(ticker, self.directory))
+        # Parse in a thread so the other tickers keep going while this one is read
+        df = await asyncio.to_thread(pd.read_csv, path)
+        return select_price_rows(df, start_date, end_date)
+
+
+class HttpCsvSource(PriceSource):
+    """
+    Downloads csv prices from {base_url}/{ticker}.csv?start=...&end=... over a pool of keep-alive connections
+    """
+
+    def __init__(self, base_url, connections=4, timeout=30):
+        """
+        base_url: string. eg. http://127.0.0.1:8000
+        connections: int. Number of connections kept open and reused for all tickers
+        timeout: float. Seconds to wait for a response
+        """
+        url = urllib.parse.urlsplit(base_url)
+        self.scheme = url.scheme
+        self.host = url.hostname
+        self.port = url.port
+        self.path = url.path.rstrip('/')
+        self.connections = connections
+        self.timeout = timeout
+        self.pool = None
+
+    def new_connection(self):
+        connection_class = http.client.HTTPSConnection if self.scheme == 'https' else http.client.HTTPConnection
+        return connection_class(self.host, self.port, timeout=self.timeout)
+
+    async def open(self):
+        self.pool = asyncio.Queue()
+        for _ in range(self.connections):
+            self.pool.put_nowait(self.new_connection())
+
+    async def close(self):
+        while self.pool is not None and not self.pool.empty():
+            self.pool.get_nowait().close()
+        self.pool = None
+
+    def request(self, connection, path):
+        """
+        connection: http.client connection. A pooled connection, it reconnects by itself after a close
+        path: string. Path and query of the request
+        returns: Tuple of the status and body bytes
+        """
+        try:
+            connection.request('GET', path)
+            response = connection.getresponse()
+            return response.status, response.read()
+        except Exception:
+            # Drop a broken connection, the next request on it opens a new one
+            connection.close()
+            raise
+
+    async def fetch(self, ticker, start_date=None, end_date=None):
+        query = urllib.parse.urlencode({key: value for key, value in [('start', start_date), ('end', end_date)] if value is not None})
+        path = '{}/{}.csv'.format(self.path, urllib.parse.quote(ticker)) + ('?' + query if query else '')
+        connection = await self.pool.get()
+        try:
+            status, body = await asyncio.to_thread(self.request, connection, path)
+        finally:
+            self.pool.put_nowait(connection)
+        if status == 404:
+            raise TickerNotFoundError('no prices for {} at {}'.format(ticker, self.host))
+        if status != 200:
+            raise ConnectionError('{} returned HTTP {} for {}'.format(self.host, status, ticker))
+        return select_price_rows(pd.read_csv(io.BytesIO(body)), start_date, end_date)
+
+
+def serve_price_files(directory='.', host='127.0.0.1', port=0, failures_per_ticker=0):
+    """
+    directory: string. Directory with {ticker}.csv files to serve
+    host: string. Address to listen on
+    port: int. Port to listen on, 0 picks a free one
+    failures_per_ticker: int. Number of HTTP 503 answers before a ticker is served, to exercise the retries
+    returns: the running stub server, its url is http://{host}:{server.server_port}, stop it with shutdown()
+    """
+    failures = {}
+    lock = threading.Lock()
+
+    class PriceFileHandler(BaseHTTPRequestHandler):
+        # HTTP/1.1 keeps the connection open between requests
+        protocol_version = 'HTTP/1.1'
+
+        def send_body(self, status, body, content_type='text/plain'):
+            self.send_response(status)
+            self.send_header('Content-Type', content_type)
+            self.send_header('Content-Length', str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+
+        def do_GET(self):
+            url = urllib.parse.urlsplit(self.path)
+            ticker = os.path.splitext(os.path.basename(urllib.parse.unquote(url.path)))[0]
+            path = os.path.join(directory, ticker + '.csv')
+            if not os.path.exists(path):
+                return self.send_body(404, b'unknown ticker')
+            with lock:
+                failures[ticker] = failures.get(ticker, 0) + 1
+                failing = failures[ticker] <= failures_per_ticker
+            if failing:
+                return self.send_body(503, b'try again')
+            query = dict(urllib.parse.parse_qsl(url.query))
+            df = select_price_rows(pd.read_csv(path), query.get('start'), query.get('end'))
+            self.send_body(200, df.to_csv(index=False).encode(), 'text/csv')
+
+        def log_message(self, *args):
+            pass
+
+    server = ThreadingHTTPServer((host, port), PriceFileHandler)
+    server.daemon_threads = True
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server
+
+
+async def fetch_with_retry(source, ticker, start_date, end_date, semaphore, retries=3, backoff=0.5):
+    """
+    source: PriceSource. The opened source
+    ticker: string. The ticker to fetch
+    start_date: string/None. First date
+    end_date: string/None. Last date
+    semaphore: asyncio.Semaphore. Bounds the number of fetches in flight
+    retries: int. Number of retries after the first attempt
+    backoff: float. Seconds before the first retry, doubled for every further retry
+    returns: Tuple of the ticker, its price df or None, the error message or None and the number of attempts
+    """
+    for attempt in range(retries + 1):
+        try:
+            async with semaphore:
+                return ticker, await source.fetch(ticker, start_date, end_date), None, attempt + 1
+        except TickerNotFoundError as error:
+            return ticker, None, str(error), attempt + 1
+        except Exception as error:
+            if attempt == retries:
+                return ticker, None, '{}: {}'.format(type(error).__name__, error), attempt + 1
+            await asyncio.sleep(backoff * 2 ** attempt)
+
+
+async def fetch_prices(tickers, source, start_date=None, end_date=None, concurrency=8, retries=3, backoff=0.5):
+    """
+    tickers: list of ticker names
+    source: PriceSource. Source of the prices
+    start_date: string/None. First date
+    end_date: string/None. Last date
+    concurrency: int. Most fetches in flight at once
+    retries: int. Number of retries of a failed fetch
+    backoff: float. Seconds before the first retry
+    returns: Tuple of a dict of ticker: price df and a failure df with the ticker, error and attempts
+    """
+    semaphore = asyncio.Semaphore(concurrency)
+    async with source:
+        results = await asyncio.gather(*[fetch_with_retry(source, ticker, start_date, end_date, semaphore, retries, backoff)
+            for ticker in tickers])
+    prices = {ticker: df for ticker, df, error, _ in results if error is None}
+    failures = pd.DataFrame([(ticker, error, attempts) for ticker, _, error, attempts in results if error is not None],
+        columns=['ticker', 'error', 'attempts'])
+    return prices, failures
+
+
+def add_schema_columns(df, by='Ticker'):
+    """
+    df: pd dataframe. Prices with the price_columns, optionally stacked for many tickers with a Ticker column
+    by: string. The column that separates tickers, ignored when it is not in df
+    returns: df with the Year, Month, Day, Weekday, Week_Number, Year_Week, Return, Short_MA and Long_MA columns
+        of the WMT.csv schema, computed for every ticker at once
+    """
+    df = df.copy()
+    dates = pd.DatetimeIndex(pd.to_datetime(df['Date']))
+    df['Date'] = dates
+    df['Year'] = dates.year
+    df['Month'] = dates.month
+    df['Day'] = dates.day
+    df['Weekday'] = dates.day_name()
+    # Weeks start on Sunday and the days before the first Sunday are week 00, like strftime %U
+    sunday_weekday = (dates.dayofweek.to_numpy() + 1) % 7
+    df['Week_Number'] = (dates.dayofyear.to_numpy() - 1 - sunday_weekday + 7) // 7
+    df['Year_Week'] = df['Year'].astype(str) + '-' + df['Week_Number'].astype(str).str.zfill(2)
+
+    # Return is the daily change of Close, the first day of every ticker is 0
+    order, group_ids = ticker_date_order(df, by)
+    close = df['Close'].to_numpy(dtype='float64')[order]
+    returns = np.zeros(len(close))
+    same_ticker = group_ids[1:] == group_ids[:-1]
+    returns[1:] = np.where(same_ticker, close[1:] / close[:-1] - 1, 0)
+    unsorted_returns = np.empty_like(returns)
+    unsorted_returns[order] = returns
+    df['Return'] = unsorted_returns
+    df = add_moving_averages(df, by=by)
+    df['Date'] = dates.strftime('%Y-%m-%d')
+    extra_columns = [column for column in df.columns if column not in schema_columns]
+    return df[extra_columns + schema_columns]
+
+
+def write_ticker_files(df, output_dir='.', file_format='csv', by='Ticker'):
+    """
+    df: pd dataframe. Output of add_schema_columns with a Ticker column
+    output_dir: string. Directory of the {ticker-name}.csv or .parquet files
+    file_format: string. csv for the WMT.csv schema, parquet for the loader's typed schema
+    by: string. The column that separates tickers
+    returns: list of the written paths
+    """
+    os.makedirs(output_dir, exist_ok=True)
+    paths = []
+    for ticker, df_ticker in df.groupby(by, sort=False):
+        df_ticker = df_ticker.drop(columns=by).sort_values('Date')
+        path = os.path.join(output_dir, '{}.{}'.format(ticker, file_format))
+        if file_format == 'parquet':
+            normalize_schema(df_ticker).to_parquet(path, index=False)
+        else:
+            df_ticker = df_ticker.assign(Week_Number=df_ticker['Week_Number'].astype(str).str.zfill(2),
+                Volume=df_ticker['Volume'].astype('float64'))
+            df_ticker.to_csv(path, index=False)
+        paths.append(path)
+    return paths
+
+
+def ingest(tickers, source, output_dir='.', start_date=None, end_date=None, file_format='csv', concurrency=8,
+        retries=3, backoff=0.5):
+    """
+    tickers: list of ticker names
+    source: PriceSource. Source of the prices
+    output_dir: string. Directory of the written files
+    start_date: string/None. First date
+    end_date: string/None. Last date
+    file_format: string. csv or parquet
+    concurrency: int. Most fetches in flight at once
+    retries: int. Number of retries of a failed fetch
+    backoff: float. Seconds before the first retry
+    returns: Tuple of the written paths and the failure df
+    """
+    prices, failures = asyncio.run(fetch_prices(tickers, source, start_date, end_date, concurrency, retries, backoff))
+    if not prices:
+        return [], failures
+    stacked = pd.concat([df.assign(Ticker=ticker) for ticker, df in prices.items()], ignore_index=True)
+    return write_ticker_files(add_schema_columns(stacked), output_dir, file_format), failures
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description='Fetch the daily prices of many tickers concurrently into ticker csv files.')
+    parser.add_argument('tickers', nargs='+', help='ticker names, eg. WMT')
+    parser.add_argument('--source-dir', default='.', help='directory of {ticker}.csv price files to read, defaults to %(default)s')
+    parser.add_argument('--url', default=None, help='base url of a csv price server, read instead of --source-dir')
+    parser.add_argument('--stub', action='store_true', help='serve --source-dir over a local stub HTTP server and fetch through it')
+    parser.add_argument('--start', default=None, help='first date, eg. 2014-01-01')
+    parser.add_argument('--end', default=None, help='last date, eg. 2018-12-31')
+    parser.add_argument('--output-dir', default='./ingested', help='directory of the written files, defaults to %(default)s')
+    parser.add_argument('--format', choices=['csv', 'parquet'], default='csv', help='csv in the WMT.csv schema or parquet')
+    parser.add_argument('--concurrency', type=int, default=8, help='most fetches in flight at once')
+    parser.add_argument('--retries', type=int, default=3, help='retries of a failed fetch, with exponential backoff')
+    args = parser.parse_args(argv)
+
+    server = None
+    if args.stub:
+        server = serve_price_files(args.source_dir)
+        source = HttpCsvSource('http://127.0.0.1:{}'.format(server.server_port), connections=args.concurrency)
+    elif args.url is not None:
+        source = HttpCsvSource(args.url, connections=args.concurrency)
+    else:
+        source = LocalFileSource(args.source_dir)
+    start = time.perf_counter()
+    try:
+        paths, failures = ingest(args.tickers, source, args.output_dir, args.start, args.end, args.format,
+            args.concurrency, args.retries)
+    finally:
+        if server is not None:
+            server.shutdown()
+    print('Wrote {} of {} tickers in {:.2f} seconds'.format(len(paths), len(args.tickers), time.perf_counter() - start))
+    for path in paths:
+        print(path)
+    if len(failures):
+        print('------------------------------------------')
+        print('{} tickers failed:'.format(len(failures)))
+        for ticker, error, attempts in failures.itertuples(index=False):
+            print('{} after {} attempts: {}'.format(ticker, attempts, error))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,160 @@
+# -*- coding: utf-8 -*-
+"""
+@author: rwang
+"""
+import contextlib
+import functools
+import json
+import os
+import sys
+import time
+
+# This file records how long the hot paths take (csv loading, year slices, digit counts, weekly groupby,
+# pdf pages) as json lines. Recording is off unless a log file is set, either with enable() or the
+# STOCK_ANALYSIS_TRACE environment variable, which worker processes inherit. While it is off every
+# instrumented call only costs one extra function call and an attribute check.
+
+trace_environment_variable = 'STOCK_ANALYSIS_TRACE'
+
+
+class TraceState:
+    log_file = os.environ.get(trace_environment_variable) or None
+
+
+state = TraceState()
+
+
+def enable(log_file):
+    """
+    log_file: string. Json lines file the records are appended to
+    """
+    state.log_file = log_file
+    # Worker processes started from here on record into the same file
+    os.environ[trace_environment_variable] = log_file
+
+
+def disable():
+    state.log_file = None
+    os.environ.pop(trace_environment_variable, None)
+
+
+def peak_rss_mb():
+    """
+    returns: float with the peak resident memory of this process in MB, None when neither the resource module
+        (Unix only) nor psutil is available
+    """
+    try:
+        import resource
+    except ImportError:
+        try:
+            import psutil
+        except ImportError:
+            return None
+        memory = psutil.Process().memory_info()
+        # Windows reports the peak working set, other platforms only the current one
+        return getattr(memory, 'peak_wset', memory.rss) / 2 ** 20
+    # ru_maxrss is in bytes on macOS and KB elsewhere
+    return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / (2 ** 20 if sys.platform == 'darwin' else 1024)
+
+
+def current_rss_mb():
+    """
+    returns: float with the resident memory of this process in MB, the peak when the current one is not available,
+        None when neither is
+    """
+    try:
+        with open('/proc/self/statm') as f:
+            return int(f.read().split()[1]) * os.sysconf('SC_PAGE_SIZE') / 2 ** 20
+    except (OSError, ValueError):
+        return peak_rss_mb()
+
+
+def row_count(*candidates):
+    """
+    candidates: values that may be tables or arrays
+    returns: int with the length of the first candidate that is a table or array, None if there is none
+    """
+    for candidate in candidates:
+        if hasattr(candidate, 'shape') and len(getattr(candidate, 'shape')):
+            return int(candidate.shape[0])
+    return None
+
+
+def write_record(record):
+    """
+    record: dict. One timing record, written as a single json line
+    """
+    # One short write per record, appends from several processes do not interleave
+    with open(state.log_file, 'a') as f:
+        f.write(json.dumps(record, default=str) + '\n')
+
+
+@contextlib.contextmanager
+def timed_stage(name, rows=None):
+    """
+    name: string. Name of the stage in the log
+    rows: int/None. Number of rows the stage works on, can also be set on the yielded record
+    yields: dict record that is written when the stage ends, or None when recording is off
+    """
+    if state.log_file is None:
+        yield None
+        return
+    record = {'stage': name, 'rows': rows, 'pid': os.getpid()}
+    rss_before = current_rss_mb()
+    start = time.perf_counter()
+    try:
+        yield record
+    finally:
+        record['seconds'] = time.perf_counter() - start
+        rss_after = current_rss_mb()
+        record['rss_mb'] = rss_after
+        record['rss_delta_mb'] = None if rss_after is None or rss_before is None else rss_after - rss_before
+        record['time'] = time.time()
+        write_record(record)
+
+
+def instrumented(name=None):
+    """
+    name: string/None. Name of the stage in the log, defaults to the function name
+    returns: decorator that records every call of the function with the rows of its first table argument or its result
+    """
+    def decorator(function):
+        stage = name or function.__name__
+
+        @functools.wraps(function)
+        def wrapper(*args, **kwargs):
+            if state.log_file is None:
+                return function(*args, **kwargs)
+            with timed_stage(stage) as record:
+                result = function(*args, **kwargs)
+                record['rows'] = row_count(*args, *kwargs.values(), result)
+            return result
+        return wrapper
+    return decorator
+
+
+@contextlib.contextmanager
+def capture_profile(output_file, profiler='cprofile'):
+    """
+    output_file: string. File the profile is written to, a pstats dump for cprofile and html for pyinstrument
+    profiler: string. cprofile or pyinstrument
+    """
+    if profiler == 'pyinstrument':
+        from pyinstrument import Profiler
+        session = Profiler()
+        session.start()
+        try:
+            yield session
+        finally:
+            session.stop()
+            with open(output_file, 'w') as f:
+                f.write(session.output_html())
+    else:
+        import cProfile
+        session = cProfile.Profile()
+        session.enable()
+        try:
+            yield session
+        finally:
+            session.disable()
+            session.dump_stats(output_file)
@@ -0,0 +1,124 @@
+# -*- coding: utf-8 -*-
+"""
+@author: rwang
+"""
+import argparse
+import os
+import time
+import numpy as np
+import pandas as pd
+from .loader import load_ticker_csv, ticker_from_path
+from .rolling_statistics import ticker_date_order, window_starts
+from .week_labeler import weekly_features, label_weeks_by_rule, hand_week_labels, broadcast_week_labels
+
+ticker='WMT'
+ticker_file = os.path.join('./' + ticker + '_Labeled_Weeks_Self.csv')
+initial_value = 100
+
+# This file backtests "hold the stock in GREEN weeks, hold cash in RED weeks" for many label
+# variants and tickers at once. Every variant is one row of a (variants x days) position matrix.
+
+
+def daily_adj_close_returns(df, by='Ticker'):
+    """
+    df: pd dataframe. Data in the WMT.csv schema, sorted by ticker and date
+    by: string. The column that separates tickers, ignored when it is not in df
+    returns: numpy array of daily Adj Close returns (not in percent), the first day of every ticker is 0
+    """
+    adj_close = df['Adj Close']
+    previous = adj_close.groupby(df[by]).shift(1) if by in df.columns else adj_close.shift(1)
+    return (adj_close / previous - 1).fillna(0).to_numpy(dtype='float64')
+
+
+def backtest(returns, positions, group_ids=None, initial_value=initial_value):
+    """
+    returns: numpy array. Daily returns of every row, rows of a ticker are contiguous and in date order
+    positions: numpy array. (variants x days) array, 1 when the stock is held through the day and 0 for cash
+    group_ids: numpy array/None. Ticker code of every row, None for a single ticker
+    initial_value: int/float. Starting value of every ticker and variant
+    returns: dict with the equity curves (variants x days), the final value and the number of trades (variants x tickers)
+    """
+    positions = np.atleast_2d(np.asarray(positions, dtype='float64'))
+    group_ids = np.zeros(len(returns), dtype='int64') if group_ids is None else np.asarray(group_ids)
+    starts = window_starts(group_ids, len(group_ids) + 1)
+    is_group_start = starts == np.arange(len(group_ids))
+    group_first_rows = np.flatnonzero(is_group_start)
+
+    # Days without a usable return (a missing price or a previous price of 0) are flat days
+    returns = np.asarray(returns, dtype='float64')
+    returns = np.where(np.isfinite(returns), returns, 0)
+    growth = positions * returns
+    # Holding through a loss of 100% or more wipes the ticker out for the rest of its days
+    ruin = growth <= -1
+    log_growth = np.log1p(np.where(ruin, 0, growth))
+    # Sum log growth instead of a product, the first row of every ticker takes back the total of the ticker
+    # before it so the running sum restarts at every ticker
+    group_log_growth = np.add.reduceat(log_growth, group_first_rows, axis=1)
+    log_growth[:, group_first_rows[1:]] -= group_log_growth[:, :-1]
+    log_growth = np.cumsum(log_growth, axis=1)
+    ruined = np.cumsum(ruin, axis=1)
+    ruined_before_group = np.concatenate([np.zeros((len(positions), 1), dtype=ruined.dtype), ruined[:, :-1]], axis=1)[:, starts]
+    equity = np.where(ruined > ruined_before_group, 0.0, initial_value * np.exp(log_growth))
+    group_last_rows = np.concatenate([group_first_rows[1:], [len(group_ids)]]) - 1
+
+    # A trade is every buy or sell, the position before the first day of a ticker is cash
+    previous_positions = np.concatenate([np.zeros((len(positions), 1)), positions[:, :-1]], axis=1)
+    previous_positions[:, is_group_start] = 0
+    changes = np.abs(positions - previous_positions)
+    trades = np.add.reduceat(changes, group_first_rows, axis=1).astype('int64')
+    return {'equity': equity, 'final_value': equity[:, group_last_rows], 'trades': trades}
+
+
+def label_positions(labels):
+    """
+    labels: array like. (variants x days) GREEN/RED labels
+    returns: numpy array with 1 for GREEN days and 0 for RED days
+    """
+    return (np.asarray(labels) == 'GREEN').astype('float64')
+
+
+def benchmark_backtest(variants=1000, days=2520, tickers=1, repeat=5, seed=0):
+    """
+    variants: int. Number of strategy variants
+    days: int. Number of days of every ticker
+    tickers: int. Number of tickers stacked in the day axis
+    repeat: int. Number of timed runs, the fastest one is reported
+    seed: int. Seed of the random returns and positions
+    returns: float with the strategies x days per second
+    """
+    random = np.random.default_rng(seed)
+    returns = random.normal(0.0003, 0.01, days * tickers)
+    positions = random.random((variants, days * tickers)) < 0.5
+    group_ids = np.repeat(np.arange(tickers), days)
+    best = np.inf
+    for _ in range(repeat):
+        start = time.perf_counter()
+        backtest(returns, positions, group_ids)
+        best = min(best, time.perf_counter() - start)
+    return variants * days * tickers / best
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description='Backtest holding the stock in GREEN weeks and cash in RED weeks.')
+    parser.add_argument('--file', default=ticker_file, help='ticker csv to analyze, defaults to %(default)s')
+    args = parser.parse_args(argv)
+    df = load_ticker_csv(args.file)
+    order, group_ids = ticker_date_order(df)
+    df = df.iloc[order].reset_index(drop=True)
+    features = weekly_features(df)
+    variants = {'Hand labels': hand_week_labels(df, features),
+        'Positive mean return': label_weeks_by_rule(features),
+        'Positive mean return and MA crossover': label_weeks_by_rule(features, use_ma_crossover=True),
+        'Buy and hold': np.full(len(features), 'GREEN')}
+    positions = np.vstack([label_positions(broadcast_week_labels(df, features, labels)['Classification']) for labels in variants.values()])
+    result = backtest(daily_adj_close_returns(df), positions, group_ids)
+
+    table = pd.DataFrame({'Strategy': list(variants), 'Final Value': result['final_value'][:, 0], 'Trades': result['trades'][:, 0]})
+    print('Starting with ${} in {} from {} to {}'.format(initial_value, ticker_from_path(args.file), df['Date'].iloc[0].date(), df['Date'].iloc[-1].date()))
+    print(table.to_string(index=False))
+    print('------------------------------------------')
+    print('Backtest speed: {:,.0f} strategies x days per second'.format(benchmark_backtest()))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,284 @@
+# -*- coding: utf-8 -*-
+"""
+@author: rwang
+"""
+import argparse
+import os
+import numpy as np 
+import pandas as pd
+from .loader import file_fingerprint, load_ticker_csv
+from .instrumentation import instrumented
+from .statistics_cache import cached_statistic, date_range_slice
+
+ticker='WMT'
+ticker_file = os.path.join('./' + ticker + '.csv')
+
+
+@instrumented()
+def list_all_open_days_by_cent(df, year_start, year_end, dataset=None):
+    """
+    df: pd dataframe. Data of interest
+    year_start: int/string. The start year
+    year_end: int/string. The end year 
+    dataset: string/None. Key of the data in df for the statistics cache, eg. the sha256 of its csv, None to not cache
+    returns: Series with unique sort day counts
+    """
+    year_start = str(year_start)
+    year_end = str(year_end)
+    # Return is calculated as a percentage, eg. 0.3 -> 0.3%
+    start_date=year_start + '-01-01'; 
+    end_date=year_end + '-12-31'
+    df_returns = date_range_slice(df, start_date, end_date, dataset)
+    cent_days = pd.Series(open_price_cent_digits(df_returns['Open']), index=df_returns.index)
+    # Days without an open price have no digit
+    cent_days = cent_days[cent_days >= 0]
+    # Sort the days
+    unique_sort_day_counts = pd.Series('Frequencies', index = ['Digit'])
+    unique_sort_day_counts = pd.concat([unique_sort_day_counts, cent_days.value_counts(sort=True)])
+    return unique_sort_day_counts
+
+
+def open_price_cent_digits(open_prices):
+    """
+    open_prices: array like. Open prices in dollars
+    returns: int64 numpy array with the "cent" digit of every price, -1 for missing (NaN or infinite) prices
+    """
+    open_prices = np.asarray(open_prices, dtype='float64')
+    finite = np.isfinite(open_prices)
+    # Round to whole cents before the mod, 77.60 * 100 is 7759.999... and would otherwise give 9
+    cents = np.rint(np.multiply(np.where(finite, open_prices, 0), 100)).astype('int64')
+    return np.where(finite, np.remainder(cents, 10), -1)
+
+
+@instrumented()
+def count_digits_by(df, keys=('Year',)):
+    """
+    df: pd dataframe. Data of interest with an Open column
+    keys: list of column names to group by, eg. ['Year'], ['Year', 'Month'] or ['Ticker', 'Year']
+    returns: df of digit counts with one row per group and all 10 digits as columns, days without an open price are not counted
+    """
+    keys = list(keys)
+    grouped = df.groupby(keys, sort=True)
+    group_codes = grouped.ngroup().fillna(-1).to_numpy().astype('int64')
+    group_index = grouped.size().index
+    digits = open_price_cent_digits(df['Open'])
+    # Leave out missing prices and rows without a group (NaN keys)
+    counted = (digits >= 0) & (group_codes >= 0)
+    # One bincount over group * 10 + digit gives the whole (groups x digits) matrix,
+    # digits that never occur in a group are kept as 0 so every row has 10 entries
+    counts = np.bincount(group_codes[counted] * 10 + digits[counted], minlength=len(group_index) * 10)
+    return pd.DataFrame(counts.reshape(len(group_index), 10), index=group_index, columns=range(10))
+
+def max_absolute_error(actual_vector, prediction_vector):
+    """
+    actual_vector: vector for actual data
+    prediction_vector: vector for prediction data
+    return: float for the absolute error
+    """
+    # Find the max of the absolute value of the difference between the prediction and absolute vector
+    # For actual_vector = a1, a2, ... an and prediction_vector p1, p2, ... pn
+    # The error is calculated as: max(|a1-p1|, |a2-p2|, ...., |an-pn|)
+    vector_diff = np.subtract(actual_vector, prediction_vector)
+    abs_vector_diff = np.abs(vector_diff)
+    return np.round(np.max(abs_vector_diff), 5)
+
+
+def median_absolute_error(actual_vector, prediction_vector):
+    """
+    actual_vector: vector for actual data
+    prediction_vector: vector for prediction data
+    return: float for the absolute error
+    """
+    # Find the median_absolute_error of the absolute value of the difference between the prediction and absolute vector
+    # For actual_vector = a1, a2, ... an and prediction_vector p1, p2, ... pn
+    # The error is calculated as: median_absolute_error(|a1-p1|, |a2-p2|, ...., |an-pn|)
+    vector_diff = np.subtract(actual_vector, prediction_vector)
+    abs_vector_diff = np.abs(vector_diff)
+    return np.round(np.median(abs_vector_diff), 5)
+
+def mean_absolute_error(actual_vector, prediction_vector):
+    """
+    actual_vector: vector for actual data
+    prediction_vector: vector for prediction data
+    return: float for the absolute error
+    """
+    # Find the mean_absolute_error of the absolute value of the difference between the prediction and absolute vector
+    # For actual_vector = a1, a2, ... an and prediction_vector p1, p2, ... pn
+    # The error is calculated as: 1/N * sum from i=1 to n : |ai-pi|
+    vector_diff = np.subtract(actual_vector, prediction_vector)
+    abs_vector_diff = np.abs(vector_diff)
+    total_sum = np.sum(abs_vector_diff)
+    size = np.size(vector_diff)
+    mean_calculation = np.divide(total_sum ,size)
+    return np.round(mean_calculation, 5)
+
+def root_mean_squared_error(actual_vector, prediction_vector):
+    """
+    actual_vector: vector for actual data
+    prediction_vector: vector for prediction data
+    return: float for the RMSE
+    """
+    # Find the mean_absolute_error of the absolute value of the difference between the prediction and absolute vector
+    # For actual_vector = a1, a2, ... an and prediction_vector p1, p2, ... pn
+    # The error is calculated as: sqrt(1/N * sum from i=1 to n : (ai-pi)^2)
+    vector_diff = np.subtract(actual_vector, prediction_vector)
+    abs_vector_diff = np.abs(vector_diff)
+    abs_vector_diff_squared = np.square(abs_vector_diff)
+    total_sum = np.sum(abs_vector_diff_squared)
+    size = np.size(vector_diff)
+    mean_calculation = np.divide(total_sum ,size)
+    rmse = np.sqrt(mean_calculation)
+    return np.round(rmse, 5)
+
+def digit_error_table(digit_counts):
+    """
+    digit_counts: df of digit counts with one row per group, as returned by count_digits_by
+    returns: df with the max, median, mean and root mean squared error of every row against a uniform distribution
+    """
+    counts = np.asarray(digit_counts, dtype='float64')
+    # Convert every row into percentages and compare against 10% per digit
+    actual_percentages = np.divide(counts, np.sum(counts, axis=1, keepdims=True))
+    abs_vector_diff = np.abs(np.subtract(actual_percentages, 0.1))
+    errors = np.column_stack([np.max(abs_vector_diff, axis=1),
+        np.median(abs_vector_diff, axis=1),
+        np.mean(abs_vector_diff, axis=1),
+        np.sqrt(np.mean(np.square(abs_vector_diff), axis=1))])
+    return pd.DataFrame(np.round(errors, 5), index=digit_counts.index,
+        columns=['Max Absolute Error', 'Median Absolute Error', 'Mean Absolute Error', 'Root Mean Squared Error'])
+
+
+def create_table_by_years(df, start_year, end_year, dataset=None):
+    """
+    df: pd dataframe. Data of interest
+    year_start: int/string. The start year
+    year_end: int/string. The end year 
+    dataset: string/None. Key of the data in df for the statistics cache, eg. the sha256 of its csv, None to not cache
+    returns: Table with years and corresponding method of error
+    """
+    return digit_error_table(yearly_digit_counts(df, start_year, end_year, dataset)).T
+
+
+def yearly_digit_counts(df, start_year, end_year, dataset=None):
+    """
+    df: pd dataframe. Data of interest
+    start_year: int/string. The start year
+    end_year: int/string. The end year
+    dataset: string/None. Key of the data in df for the statistics cache, eg. the sha256 of its csv, None to not cache
+    returns: df of digit counts with one row per year, with a dataset key it is cached so the printed tables and
+        create_table_by_years share it
+    """
+    start_date = str(start_year) + '-01-01'
+    end_date = str(end_year) + '-12-31'
+    return cached_statistic(df, start_date, end_date, 'digit_counts_by_year',
+        compute=lambda df_years: count_digits_by(df_years, ['Year']), dataset=dataset)
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description='Print the last digit frequencies of the open prices and their error against a uniform distribution.')
+    parser.add_argument('--file', default=ticker_file, help='ticker csv to analyze, defaults to %(default)s')
+    args = parser.parse_args(argv)
+    df = load_ticker_csv(args.file)
+    # The sha256 of the csv names the data in the statistics cache
+    dataset = file_fingerprint(args.file)['sha256']
+    # Count every year in one pass, the 2014 to 2018 totals are the column sums
+    digit_counts = yearly_digit_counts(df, 2014, 2018, dataset)
+    total_counts = digit_counts.sum().to_frame('2014 to 2018').T
+    prediction_vector = np.full(10, 0.1)
+    # Convert the totals into percentages
+    actual_vector_percentages = np.divide(total_counts.to_numpy()[0], total_counts.to_numpy().sum())
+
+    # Print the frequencies table
+    print('Data from 2014 to 2018')
+    print(total_counts.T)
+    for year in digit_counts.index:
+        print('{} Data'.format(year))
+        print(digit_counts.loc[year])
+    print('------------------------------------------')
+    print('Question 1: ')
+    print('The most frequent digit from 2014 to 2018 is {}.'.format(total_counts.iloc[0].idxmax()))
+    for year in digit_counts.index:
+        print('The most frequent digit for {} is {}.'.format(year, digit_counts.loc[year].idxmax()))
+    print('Question 2: ')
+    print('The least frequent digit from 2014 to 2018  is {}.'.format(total_counts.iloc[0].idxmin()))
+    for year in digit_counts.index:
+        print('The least frequent digit for {} is {}.'.format(year, digit_counts.loc[year].idxmin()))
+    print('Question 3: Errors are calculated as an absolute error, not a percentage error. Multiply by 100 to get percentage error')
+    print('Calculations are for all {} years'.format(len(digit_counts)))
+    print('(a) Max Absolute Error')
+    print(max_absolute_error(actual_vector_percentages, prediction_vector))
+    print('(b) Median Absolute Error')
+    print(median_absolute_error(actual_vector_percentages, prediction_vector))
+    print('(c) Mean Absolute Error')
+    print(mean_absolute_error(actual_vector_percentages, prediction_vector))
+    print('(d) Root Mean Squared Error')
+    print(root_mean_squared_error(actual_vector_percentages, prediction_vector))
+    print('Calculations for each individual year is listed below')
+    errors = create_table_by_years(df, 2014, 2018, dataset)
+    print(errors)
+    print(conclusions(digit_counts, errors))
+
+
+def format_years(years):
+    """
+    years: list of years
+    returns: string listing the years, eg. 2015, 2016 and 2017
+    """
+    years = [str(year) for year in years]
+    return years[0] if len(years) == 1 else ', '.join(years[:-1]) + ' and ' + years[-1]
+
+
+def conclusions(digit_counts, errors):
+    """
+    digit_counts: df of digit counts with one row per year, as returned by yearly_digit_counts
+    errors: df with one column per year and one row per error, as returned by create_table_by_years
+    returns: string with the conclusions drawn from the counts and the errors
+    """
+    years = list(digit_counts.index)
+    most_frequent = digit_counts.idxmax(axis=1)
+    least_frequent = digit_counts.idxmin(axis=1)
+    top_digit = digit_counts.sum().idxmax()
+    other_years = [year for year in years if most_frequent[year] != top_digit]
+    lines = []
+    if other_years:
+        lines.append('For the most frequent digit, {} is the most frequent last digit of the opening price in {} of the {} years from {} to {}, '
+            '{} {}.'.format(top_digit, len(years) - len(other_years), len(years), years[0], years[-1],
+            'the exception is' if len(other_years) == 1 else 'the exceptions are',
+            ', '.join('{} in {}'.format(most_frequent[year], year) for year in other_years)))
+    else:
+        lines.append('For the most frequent digit, {} is the most frequent last digit of the opening price in every year from {} to {}.'.format(
+            top_digit, years[0], years[-1]))
+    if top_digit == 0:
+        lines.append('Benford\'s law does not extend to 0, but it could provide a possible explanation for the increased frequency of 0 since it is '
+            'the lowest possible digit here. A possible explanation could also be that first orders of the day will generally round to 0.')
+    lines.append('The least frequent digit {}: {}.'.format(
+        'is the same every year' if least_frequent.nunique() == 1 else 'is not consistent throughout the years',
+        ', '.join('{} in {}'.format(least_frequent[year], year) for year in years)))
+    for error_name in errors.index:
+        row = errors.loc[error_name]
+        lines.append('{} ranges from {:.2f}% in {} to {:.2f}% in {}.'.format(error_name, 100 * row.min(), row.idxmin(),
+            100 * row.max(), row.idxmax()))
+    worst_years = errors.idxmax(axis=1)
+    if worst_years.nunique() == 1:
+        worst_year = worst_years.iloc[0]
+        lines.append('{} has the greatest error for every method, with {} as its most frequent digit in {:.1f}% of the days.'.format(
+            worst_year, most_frequent[worst_year], 100 * digit_counts.loc[worst_year].max() / digit_counts.loc[worst_year].sum()))
+    else:
+        lines.append('The year with the greatest error depends on the method: {}.'.format(
+            ', '.join('{} for {}'.format(year, format_years(list(names))) for year, names in worst_years.groupby(worst_years).groups.items())))
+    return '\n'.join(lines)
+
+
+if __name__ == "__main__":
+    main()
+
+
+
+
+
+
+
+
+
+
+
+
+
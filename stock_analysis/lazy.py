@@ -0,0 +1,26 @@
+# -*- coding: utf-8 -*-
+"""
+@author: rwang
+"""
+
+# matplotlib and scipy take most of the import time of the package, so they are only imported
+# by the functions that draw or test something, the first time one of them is called.
+
+
+def load_pyplot():
+    """
+    returns: matplotlib.pyplot with the non-interactive Agg backend
+    """
+    import matplotlib
+    # Render without a GUI backend, this also lets worker processes draw pages
+    matplotlib.use('Agg')
+    import matplotlib.pyplot as plt
+    return plt
+
+
+def load_scipy_stats():
+    """
+    returns: the scipy.stats module
+    """
+    import scipy.stats
+    return scipy.stats
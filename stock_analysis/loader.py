@@ -0,0 +1,133 @@
+# -*- coding: utf-8 -*-
+"""
+@author: rwang
+"""
+import hashlib
+import json
+import os
+import numpy as np
+import pandas as pd
+from .instrumentation import instrumented
+
+# This file loads the {ticker-name}.csv and {ticker-name}_Labeled.csv files into one typed schema
+# and keeps a Parquet copy next to them, so repeated runs do not parse the text again.
+
+# Bump this when normalize_schema changes so old caches are rebuilt
+schema_version = 1
+integer_columns = ['Year', 'Month', 'Day', 'Week_Number']
+categorical_columns = ['Weekday', 'Year_Week', 'Classification']
+price_columns = ['Open', 'High', 'Low', 'Close']
+# Prices are stored as float32 only while whole cents still survive the conversion
+float32_price_limit = 100000
+
+
+def normalize_schema(df):
+    """
+    df: pd dataframe. Data in the WMT.csv or WMT_Labeled.csv schema
+    returns: df with parsed dates, categorical labels and narrower numeric types where it is safe
+    """
+    df = df.copy()
+    # WMT.csv uses 2014-01-02 and WMT_Labeled.csv uses 1/2/2018, both become datetime64
+    df['Date'] = pd.to_datetime(df['Date'])
+    for column in integer_columns:
+        if column in df.columns:
+            df[column] = df[column].astype('int32')
+    for column in categorical_columns:
+        if column in df.columns:
+            df[column] = df[column].astype('category')
+    for column in price_columns:
+        if column in df.columns and df[column].abs().max() < float32_price_limit:
+            df[column] = df[column].astype('float32')
+    if 'Volume' in df.columns and np.all(np.mod(df['Volume'], 1) == 0):
+        df['Volume'] = df['Volume'].astype('int64')
+    # Adj Close, Return and the moving averages feed the statistics and stay float64
+    return df
+
+
+def ticker_from_path(ticker_file):
+    """
+    ticker_file: string. Path of a ticker csv, eg. ./WMT.csv or ./WMT_Labeled_Weeks_Self.csv
+    returns: string with the ticker name, eg. WMT
+    """
+    name = os.path.splitext(os.path.basename(ticker_file))[0]
+    # The labeled files are {ticker-name}_Labeled.csv and {ticker-name}_Labeled_Weeks_Self.csv
+    return name.split('_Labeled')[0]
+
+
+def file_fingerprint(ticker_file):
+    """
+    ticker_file: string. Path of a csv file
+    returns: dict with the size, modification time and sha256 of the file
+    """
+    sha256 = hashlib.sha256()
+    with open(ticker_file, 'rb') as f:
+        for block in iter(lambda: f.read(1 << 20), b''):
+            sha256.update(block)
+    stat = os.stat(ticker_file)
+    return {'size': stat.st_size, 'mtime_ns': stat.st_mtime_ns, 'sha256': sha256.hexdigest()}
+
+
+def cache_paths(ticker_file, cache_dir=None):
+    """
+    ticker_file: string. Path of a csv file
+    cache_dir: string/None. Directory of the cache, defaults to .ticker_cache next to the csv
+    returns: Tuple of the Parquet path and the metadata path of the cache
+    """
+    if cache_dir is None:
+        cache_dir = os.path.join(os.path.dirname(os.path.abspath(ticker_file)), '.ticker_cache')
+    name = os.path.splitext(os.path.basename(ticker_file))[0]
+    return os.path.join(cache_dir, name + '.parquet'), os.path.join(cache_dir, name + '.json')
+
+
+def cache_is_valid(ticker_file, metadata_file):
+    """
+    ticker_file: string. Path of a csv file
+    metadata_file: string. Path of the cache metadata
+    returns: bool, True when the cache was built from the current contents of the csv
+    """
+    if not os.path.exists(metadata_file):
+        return False
+    with open(metadata_file) as f:
+        metadata = json.load(f)
+    if metadata.get('schema_version') != schema_version:
+        return False
+    stat = os.stat(ticker_file)
+    if metadata['size'] != stat.st_size:
+        return False
+    if metadata['mtime_ns'] == stat.st_mtime_ns:
+        return True
+    # The file was touched, only rebuild if the contents really changed
+    return metadata['sha256'] == file_fingerprint(ticker_file)['sha256']
+
+
+@instrumented()
+def load_ticker_csv(ticker_file, cache_dir=None, use_cache=True):
+    """
+    ticker_file: string. Path of a csv in the WMT.csv or WMT_Labeled.csv schema
+    cache_dir: string/None. Directory of the cache, defaults to .ticker_cache next to the csv
+    use_cache: bool. Read and write the Parquet cache, this needs pyarrow or fastparquet
+    returns: df with the normalized schema
+    """
+    if use_cache:
+        try:
+            import pyarrow  # noqa: F401
+        except ImportError:
+            try:
+                import fastparquet  # noqa: F401
+            except ImportError:
+                use_cache = False
+    if not use_cache:
+        return normalize_schema(pd.read_csv(ticker_file))
+
+    parquet_file, metadata_file = cache_paths(ticker_file, cache_dir)
+    if os.path.exists(parquet_file) and cache_is_valid(ticker_file, metadata_file):
+        return pd.read_parquet(parquet_file)
+
+    fingerprint = file_fingerprint(ticker_file)
+    df = normalize_schema(pd.read_csv(ticker_file))
+    os.makedirs(os.path.dirname(parquet_file), exist_ok=True)
+    df.to_parquet(parquet_file, index=False)
+    fingerprint['schema_version'] = schema_version
+    with open(metadata_file, 'w') as f:
+        json.dump(fingerprint, f)
+    return df
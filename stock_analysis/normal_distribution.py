@@ -0,0 +1,180 @@
+# -*- coding: utf-8 -*-
+"""
+Created on Mon Nov  5 14:37:29 2018
+
+@author: epinsky
+@Modified: rwang
+"""
+import argparse
+import os
+import numpy as np 
+import pandas as pd
+from .loader import load_ticker_csv
+from .lazy import load_pyplot, load_scipy_stats
+from .rolling_statistics import rolling_moments, rolling_tail_counts, ticker_date_order
+
+# modify these locations for your directories
+ticker='WMT'
+ticker_file = os.path.join('./' + ticker + '.csv')
+tail_sigmas = [1, 2, 3]
+
+# This file is meant to visualize the std deviation and mean values for the year of 2018, and to
+# screen many (ticker, year) groups or rolling windows for normality without drawing anything.
+
+
+def normality_tests(df, by=None, column='Return', shapiro=False):
+    """
+    df: pd dataframe. Data of interest, optionally stacked for many tickers with a Ticker column
+    by: list/None. Columns to group by, defaults to Ticker (when present) and Year
+    column: string. The column of daily returns, converted to a percentage like the rest of the tables
+    shapiro: bool. Also run the Shapiro-Wilk test, this one is a loop over the groups
+    returns: df with one row per group: size, mu, sigma, skew, excess kurtosis, Jarque-Bera, Kolmogorov-Smirnov
+        and Anderson-Darling against the fitted normal with their p-values, and the empirical and normal
+        fraction of days beyond 1, 2 and 3 sigma
+    """
+    scipy = load_scipy_stats()
+    if by is None:
+        by = [key for key in ['Ticker', 'Year'] if key in df.columns]
+    df = df[df[column].notna()]
+    grouped = df.groupby(by, sort=True)
+    group_index = grouped.size().index
+    # Sort by group and value once, every test below is a bincount or reduceat over these arrays
+    codes = grouped.ngroup().to_numpy()
+    values = 100.0 * df[column].to_numpy(dtype='float64')
+    order = np.lexsort((values, codes))
+    x = values[order]
+    g = codes[order]
+    n = np.bincount(g, minlength=len(group_index)).astype('float64')
+    starts = np.concatenate([[0], np.cumsum(n)[:-1]]).astype('int64')
+
+    mean = np.bincount(g, x, minlength=len(n)) / n
+    deviation = x - mean[g]
+    m2 = np.bincount(g, deviation ** 2, minlength=len(n)) / n
+    m3 = np.bincount(g, deviation ** 3, minlength=len(n)) / n
+    m4 = np.bincount(g, deviation ** 4, minlength=len(n)) / n
+    with np.errstate(divide='ignore', invalid='ignore'):
+        std = np.sqrt(m2 * n / (n - 1))
+        skew = m3 / m2 ** 1.5
+        kurtosis = m4 / m2 ** 2 - 3
+        jarque_bera = n / 6 * (skew ** 2 + kurtosis ** 2 / 4)
+
+        # Fitted normal cdf of every sorted value, rank is the 0 based position inside its group
+        z = deviation / std[g]
+        cdf = scipy.norm.cdf(z)
+        rank = np.arange(len(x)) - starts[g]
+        ks_statistic = np.maximum.reduceat(np.maximum((rank + 1) / n[g] - cdf, cdf - rank / n[g]), starts)
+        # Anderson-Darling pairs the i-th smallest value with the i-th largest one of the same group
+        mirror = starts[g] + n[g].astype('int64') - 1 - rank
+        # Log cdf and log survival keep the far tails exact instead of rounding 1 - cdf to 0
+        ad_terms = (2 * rank + 1) * (scipy.norm.logcdf(z) + scipy.norm.logsf(z[mirror]))
+        anderson_darling = -n - np.bincount(g, ad_terms, minlength=len(n)) / n
+
+    table = pd.DataFrame({'Trading Days': n.astype('int64'), 'mu': mean, 'sigma': std, 'skew': skew, 'kurtosis': kurtosis,
+        'Jarque-Bera': jarque_bera, 'Jarque-Bera p-value': np.exp(-jarque_bera / 2),
+        'Kolmogorov-Smirnov': ks_statistic, 'Kolmogorov-Smirnov p-value': scipy.kstwo.sf(ks_statistic, n.astype('int64')),
+        'Anderson-Darling': anderson_darling, 'Anderson-Darling p-value': anderson_darling_p_value(anderson_darling, n)},
+        index=group_index)
+    for k in tail_sigmas:
+        table['Tail {} sigma'.format(k)] = np.bincount(g, np.abs(z) > k, minlength=len(n)) / n
+        table['Normal tail {} sigma'.format(k)] = 2 * scipy.norm.sf(k)
+    if shapiro:
+        table['Shapiro-Wilk'], table['Shapiro-Wilk p-value'] = zip(*[scipy.shapiro(x[start:start + int(size)]) if size >= 3 else (np.nan, np.nan)
+            for start, size in zip(starts, n)])
+    return table.reset_index()
+
+
+def anderson_darling_p_value(anderson_darling, n):
+    """
+    anderson_darling: numpy array. Anderson-Darling statistics against a normal with fitted mu and sigma
+    n: numpy array. Sample size of every statistic
+    returns: numpy array of p-values from D'Agostino and Stephens (1986) for the size adjusted statistic
+    """
+    adjusted = anderson_darling * (1 + 0.75 / n + 2.25 / n ** 2)
+    with np.errstate(over='ignore'):
+        return np.select([adjusted >= 0.6, adjusted >= 0.34, adjusted >= 0.2],
+            [np.exp(1.2937 - 5.709 * adjusted + 0.0186 * adjusted ** 2),
+            np.exp(0.9177 - 4.279 * adjusted - 1.38 * adjusted ** 2),
+            1 - np.exp(-8.318 + 42.796 * adjusted - 59.938 * adjusted ** 2)],
+            1 - np.exp(-13.436 + 101.14 * adjusted - 223.73 * adjusted ** 2))
+
+
+def rolling_normality(df, window=60, column='Return', by='Ticker'):
+    """
+    df: pd dataframe. Data of interest, optionally stacked for many tickers with a Ticker column
+    window: int. Number of trailing trading days in every window
+    column: string. The column of daily returns, converted to a percentage like the rest of the tables
+    by: string. The column that separates tickers, ignored when it is not in df
+    returns: df with the Jarque-Bera statistic and p-value and the fraction of days beyond 1, 2 and 3 sigma
+        of the trailing window ending at every day, in the original row order
+    """
+    order, group_ids = ticker_date_order(df, by)
+    values = 100.0 * df[column].to_numpy(dtype='float64')[order]
+    moments = rolling_moments(values, group_ids, window, bias=True)
+    jarque_bera = moments['count'] / 6 * (moments['skew'] ** 2 + moments['kurtosis'] ** 2 / 4)
+    statistics = {'Rolling_Jarque_Bera_{}'.format(window): jarque_bera,
+        'Rolling_Jarque_Bera_p_value_{}'.format(window): np.exp(-jarque_bera / 2)}
+    sample = rolling_moments(values, group_ids, window)
+    for k in tail_sigmas:
+        below, above = rolling_tail_counts(values, group_ids, window, sample['mean'], sample['std'], k)
+        statistics['Rolling_Tail_{}_Sigma_{}'.format(k, window)] = np.where(np.isnan(sample['std']), np.nan, (below + above) / moments['count'])
+
+    df = df.copy()
+    for name, sorted_values in statistics.items():
+        unsorted_values = np.empty_like(sorted_values)
+        unsorted_values[order] = sorted_values
+        df[name] = unsorted_values
+    return df
+
+
+def plot_returns_vs_normal(df, ticker, year, low_return=-5, high_return=5):
+    """
+    df: pd dataframe. Data of interest
+    ticker: string. The ticker name for the title and file name
+    year: string. The year to plot
+    low_return: int/float. Lowest daily return in percent to plot
+    high_return: int/float. Highest daily return in percent to plot
+    returns: string with the name of the saved pdf
+    """
+    plt = load_pyplot()
+    scipy = load_scipy_stats()
+    df = df.copy()
+    df['Return'] = 100.0 * df['Return']
+    start_date=year + '-01-01'
+    end_date=year + '-12-31'
+    df = df[df['Date'] >= start_date]
+    df = df[df['Date'] <= end_date]
+    df = df[(df['Return']>low_return) & (df['Return'] < high_return)]
+    fig = plt.figure()
+    returns_list = df['Return'].values
+    plt.hist(returns_list, density=True, bins = 30, label='Daily Returns')
+    x = np.linspace(low_return, high_return, 1000)
+    ticker_mean = df['Return'].mean()
+    ticker_std = df['Return'].std()
+
+    plt.plot(x, scipy.norm.pdf(x, ticker_mean,ticker_std), color='red',
+            label='Normal, ' + r'$\mu=$' + str(round(ticker_mean,2)) +
+            ', ' + r'$\sigma=$' + str(round(ticker_std,2)))
+    plt.title('daily returns for ' + ticker +  ' for year ' +  year)
+    plt.legend()
+    output_file = 'returns_' + year + '_' + ticker + '_' + str(year) + '.pdf'
+    plt.savefig(output_file)
+    plt.close(fig)
+    return output_file
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description='Plot the 2018 daily returns against a normal and print the normality tests for every year.')
+    parser.add_argument('--file', default=ticker_file, help='ticker csv to analyze, defaults to %(default)s')
+    args = parser.parse_args(argv)
+    try:
+        df = load_ticker_csv(args.file)
+        plot_returns_vs_normal(df, ticker, '2018')
+        print(normality_tests(df).to_string(index=False))
+
+    except Exception as e:
+        print(e)
+        print('failed to read stock data for ticker: ', ticker)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,201 @@
+# -*- coding: utf-8 -*-
+"""
+@author: rwang
+"""
+import argparse
+import os
+import numpy as np
+import pandas as pd
+from .loader import load_ticker_csv
+from .instrumentation import instrumented
+from .statistics_cache import cached_statistic, date_range_slice, year_bounds
+
+ticker='WMT'
+ticker_file = os.path.join('./' + ticker + '.csv')
+
+
+@instrumented()
+def number_of_days_positive_negative_returns(df, year, dataset=None):
+    """
+    df: pd dataframe. Data of interest
+    year: int. The year of calculating positive and negative returns
+    dataset: string/None. Key of the data in df for the statistics cache, eg. the sha256 of its csv, None to not cache
+    returns: Tuple with positive and negative days
+    """
+    year = str(year)
+    start_date, end_date = year_bounds(year)
+    # With a dataset key the counts of a year are cached, asking for the same year again is a lookup
+    counts = cached_statistic(df, start_date, end_date, 'counts', dataset=dataset)
+    returns_less_than_zero = counts['negative']
+    returns_greater_than_zero = counts['positive']
+    print('The number of days where returns are negative for the year {} are {}'.format(year, returns_less_than_zero))
+    print('The number of days where returns are positive for the year {} are {}'.format(year, returns_greater_than_zero))
+    return returns_greater_than_zero, returns_less_than_zero
+
+
+@instrumented()
+def create_daily_returns(df, year, dataset=None):
+    """
+    df: pd dataframe. Data of interest
+    year: int. The year of calculating positive and negative returns
+    dataset: string/None. Key of the data in df for the statistics cache, eg. the sha256 of its csv, None to not cache
+    returns: a df with the following columns: year | trading days |  mu | % days < mu | % days > mu
+    """
+    # Calculate average daily return from a year of data, mu
+    year = str(year)
+    start_date, end_date = year_bounds(year)
+    # With a dataset key the year is sliced once and shared by all three per year functions through the cache
+    # Return is calculated as a percentage, eg. 0.3 -> 0.3%
+    returns_list = date_range_slice(df, start_date, end_date, dataset)['Return'] * 100
+    total_days = returns_list.size
+    mean = cached_statistic(df, start_date, end_date, 'mean', dataset=dataset)
+    # Less than and greater than calculations
+    less_than_mean = returns_list.where(returns_list < mean).dropna().size
+    greater_than_mean = returns_list.where(returns_list > mean).dropna().size
+    # Convert to percentages
+    percent_less_than_mean = np.round(np.multiply(np.divide(less_than_mean, total_days), 100), 2)
+    percent_greater_than_mean = np.round(np.multiply(np.divide(greater_than_mean, total_days), 100), 2)
+    # Create series
+    table = {'Year': year, 'Trading Days': [total_days], 'mu': [mean], '%% days < mu': [percent_less_than_mean], '%% days > mu': [percent_greater_than_mean]}
+    return pd.DataFrame(data=table)
+
+
+@instrumented()
+def create_daily_returns_with_std_deviation(df, year, dataset=None):
+    """
+    df: pd dataframe. Data of interest
+    year: int. The year of calculating positive and negative returns
+    dataset: string/None. Key of the data in df for the statistics cache, eg. the sha256 of its csv, None to not cache
+    returns: a df with the following columns: year | trading days |  mu | sigma | % days < mu - 2 * sigma | % days > mu + 2 * sigma
+    """
+    # Calculate average daily return from a year of data, mu
+    year = str(year)
+    start_date, end_date = year_bounds(year)
+    # With a dataset key the year is sliced once and shared by all three per year functions through the cache
+    # Return is calculated as a percentage, eg. 0.3 -> 0.3%
+    returns_list = date_range_slice(df, start_date, end_date, dataset)['Return'] * 100
+    total_days = returns_list.size
+    mean = cached_statistic(df, start_date, end_date, 'mean', dataset=dataset)
+    std_deviation = cached_statistic(df, start_date, end_date, 'std', dataset=dataset)
+    two_std_deviation = std_deviation * 2
+    # Two std deviations fewer
+    two_std_deviation_fewer = mean - two_std_deviation
+    # Two std deviations greater
+    two_std_deviation_greater = mean + two_std_deviation
+    # Less than and greater than two standard deviations calculations
+    less_than_two_std_deviations = returns_list.where(returns_list < two_std_deviation_fewer).dropna().size
+    greater_than_two_std_deviations = returns_list.where(returns_list > two_std_deviation_greater).dropna().size
+    # Convert to percentages
+    percent_less_than_two_std_deviations = np.round(np.multiply(np.divide(less_than_two_std_deviations, total_days), 100), 2)
+    percent_greater_than_two_std_deviations = np.round(np.multiply(np.divide(greater_than_two_std_deviations, total_days), 100), 2)
+    # Create series
+    table = {'Year': year, 'Trading Days': [total_days], 'mu': [mean], 'sigma': [std_deviation], '%% days < mu - 2 * sigma': [percent_less_than_two_std_deviations],
+    '%% days > mu + 2 * sigma': [percent_greater_than_two_std_deviations]}
+    return pd.DataFrame(data=table)
+
+
+def index_returns_by_date(df):
+    """
+    df: pd dataframe. Data of interest with a Date and Return column
+    returns: Series of returns as a percentage, indexed by a sorted DatetimeIndex
+    """
+    # Parse the dates once so every year can be sliced without string comparisons
+    dates = pd.to_datetime(df['Date'])
+    # Return is calculated as a percentage, eg. 0.3 -> 0.3%
+    returns_list = pd.Series(df['Return'].to_numpy() * 100, index=pd.DatetimeIndex(dates), name='Return')
+    return returns_list.sort_index()
+
+
+@instrumented()
+def create_yearly_return_tables(df, start_year=None, end_year=None, k=2):
+    """
+    df: pd dataframe. Data of interest
+    start_year: int/None. The first year of the tables, defaults to the first year in the data
+    end_year: int/None. The last year of the tables, defaults to the last year in the data
+    k: int/float. The number of standard deviations used for the tails
+    returns: Tuple of three dfs, all computed in a single pass over the data:
+        year | positive days | negative days
+        year | trading days | mu | % days < mu | % days > mu
+        year | trading days | mu | sigma | % days < mu - k * sigma | % days > mu + k * sigma
+    """
+    returns_list = index_returns_by_date(df)
+    # Slicing a sorted DatetimeIndex is a binary search, not a full scan
+    start = None if start_year is None else str(start_year)
+    end = None if end_year is None else str(end_year)
+    returns_list = returns_list.loc[start:end]
+    years = returns_list.index.year
+    grouped = returns_list.groupby(years)
+
+    total_days = grouped.size()
+    mean = grouped.mean()
+    std_deviation = grouped.std()
+    # Broadcast the per year statistics back to every day so all comparisons are vectorized
+    daily_mean = grouped.transform('mean')
+    daily_std = grouped.transform('std')
+    k_std_deviation_fewer = daily_mean - k * daily_std
+    k_std_deviation_greater = daily_mean + k * daily_std
+
+    def count_by_year(mask):
+        return mask.groupby(years).sum().reindex(total_days.index, fill_value=0).astype('int64')
+
+    def percent_of_days(counts):
+        return np.round(np.multiply(np.divide(counts, total_days), 100), 2)
+
+    positive_negative = pd.DataFrame({'Year': total_days.index,
+        'Positive Days': count_by_year(returns_list > 0).to_numpy(),
+        'Negative Days': count_by_year(returns_list < 0).to_numpy()})
+    daily_returns = pd.DataFrame({'Year': total_days.index, 'Trading Days': total_days.to_numpy(), 'mu': mean.to_numpy(),
+        '%% days < mu': percent_of_days(count_by_year(returns_list < daily_mean)).to_numpy(),
+        '%% days > mu': percent_of_days(count_by_year(returns_list > daily_mean)).to_numpy()})
+    daily_returns_with_std_deviation = pd.DataFrame({'Year': total_days.index, 'Trading Days': total_days.to_numpy(),
+        'mu': mean.to_numpy(), 'sigma': std_deviation.to_numpy(),
+        '%% days < mu - {} * sigma'.format(k): percent_of_days(count_by_year(returns_list < k_std_deviation_fewer)).to_numpy(),
+        '%% days > mu + {} * sigma'.format(k): percent_of_days(count_by_year(returns_list > k_std_deviation_greater)).to_numpy()})
+    return positive_negative, daily_returns, daily_returns_with_std_deviation
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description='Print the yearly positive/negative days, mu split and 2 sigma tail tables.')
+    parser.add_argument('--file', default=ticker_file, help='ticker csv to analyze, defaults to %(default)s')
+    args = parser.parse_args(argv)
+    df = load_ticker_csv(args.file)
+    df_q1, df_q2, df_q3 = create_yearly_return_tables(df, 2014, 2018)
+    print('Question 1: ')
+    for year, positive_days, negative_days in df_q1.itertuples(index=False):
+        print('Year {}'.format(year))
+        print('The number of days where returns are negative for the year {} are {}'.format(year, negative_days))
+        print('The number of days where returns are positive for the year {} are {}'.format(year, positive_days))
+        print('------------------------------------------')
+
+    print('Question 2: ')
+    print(df_q2)
+    print('The average daily return between years varies from -0.12 % to 0.14 %. While the distribution of returns is generally assumed to be not normal, in 2016 the percentage of days with gains more than')
+    print('mu and less than the mu were the same. Deviations from 50%% greater and less than mu were not larger than 2.78%. This does not indicate that the distribution is normal, but it would indicate ')
+    print('that there is no incredibly high right or left skew. Interestingly, the years with below 0 daily average returns had a higher percentage of days trading greater than the mean. All other years have a greater percentage ')
+    print('of days trading with returns below the mean. This implies that most years will have more negative trading days than positive trading days, which would follow a pattern of a mild right skew distribution.')
+
+    print('Question 3 and Question 4: ')
+    print(df_q3)
+    print('We expect that given a 2 tail normal distribution standard deviation calculation, 2 standard deviations from the mean would yield about 2.5% per tail. The calculation shown above ')
+    print('indicates that this is not the case. Each year has a significantly different percentages in its tails, usually with more in its left tail than its right tail. ')
+    print('This suggests that there are significantly more "really bad trading days" than "really good trading days" indicating that bigger drops occur more frequently than ')
+    print('bigger gains. On years with a high standard deviation of daily returns (eg. more volatile), namely 2015, 2016, and 2018, there is a significantly higher percentage of bad trading days ')
+    print('compared to good ones: 3.17% vs 1.98%, 3.57% vs 0.79%, and 1.99% vs 0.8%. On years with high positive average returns, namely 2017, there is a higher percentage of "really good trading days" than "really bad trading days", but not by as much ')
+    print('as the converse difference in 2015, 2016, and 2018. It seems as though generally, there are a higher percentage of big drops than big gains overall, and this is exacerbated by increased volatility (sigma) which deviates with majorly bullish years.')
+
+
+if __name__ == "__main__":
+    main()
+
+
+
+
+
+
+
+
+
+
+
+
+
@@ -0,0 +1,143 @@
+# -*- coding: utf-8 -*-
+"""
+@author: rwang
+"""
+import argparse
+import glob
+import os
+import time
+import traceback
+from concurrent.futures import ProcessPoolExecutor
+import pandas as pd
+from .loader import load_ticker_csv, ticker_from_path
+
+from .weekly_return_volatility import weekly_return_volatility
+from .normality_returns import create_yearly_return_tables
+from .last_digit_open_price import count_digits_by, digit_error_table
+
+# This file runs the weekly volatility, normality and last digit analyses for many
+# {ticker-name}.csv files at once. Each file is read once and shared by every analysis.
+
+table_names = ['weekly_return_volatility', 'positive_negative_days', 'daily_returns', 'daily_returns_with_std_deviation', 'last_digit_errors']
+stage_names = ['read_csv', 'weekly_return_volatility', 'normality_returns', 'last_digit']
+
+
+def find_ticker_files(patterns):
+    """
+    patterns: list of paths or glob patterns
+    returns: sorted list of unique ticker csv paths
+    """
+    ticker_files = set()
+    for pattern in patterns:
+        matches = glob.glob(pattern)
+        # Keep paths that do not match anything so they show up in the failure report
+        ticker_files.update(matches if matches else [pattern])
+    return sorted(ticker_files)
+
+
+def analyze_ticker_file(ticker_file, k=2):
+    """
+    ticker_file: string. Path of a ticker csv in the WMT.csv schema
+    k: int/float. The number of standard deviations used for the tails
+    returns: dict with the ticker, row count, stage timings and result tables, or the error on failure
+    """
+    ticker = ticker_from_path(ticker_file)
+    timings = {}
+    try:
+        start = time.perf_counter()
+        df = load_ticker_csv(ticker_file)
+        timings['read_csv'] = time.perf_counter() - start
+
+        start = time.perf_counter()
+        weekly = weekly_return_volatility(df)
+        timings['weekly_return_volatility'] = time.perf_counter() - start
+
+        start = time.perf_counter()
+        positive_negative, daily_returns, daily_returns_with_std_deviation = create_yearly_return_tables(df, k=k)
+        timings['normality_returns'] = time.perf_counter() - start
+
+        start = time.perf_counter()
+        digit_errors = digit_error_table(count_digits_by(df, ['Year'])).reset_index()
+        timings['last_digit'] = time.perf_counter() - start
+    except Exception:
+        return {'ticker': ticker, 'file': ticker_file, 'error': traceback.format_exc()}
+
+    tables = dict(zip(table_names, [weekly, positive_negative, daily_returns, daily_returns_with_std_deviation, digit_errors]))
+    return {'ticker': ticker, 'file': ticker_file, 'rows': len(df), 'timings': timings, 'tables': tables}
+
+
+def merge_results(results):
+    """
+    results: list of dicts as returned by analyze_ticker_file
+    returns: Tuple of a dict of consolidated tables, a failure df and a stage throughput df
+    """
+    succeeded = [result for result in results if 'error' not in result]
+    failed = [result for result in results if 'error' in result]
+
+    merged_tables = {}
+    for name in table_names:
+        frames = [result['tables'][name].assign(Ticker=result['ticker']) for result in succeeded]
+        if frames:
+            merged = pd.concat(frames, ignore_index=True)
+            # Put the ticker first so the consolidated tables read like the single ticker ones
+            merged_tables[name] = merged[['Ticker'] + [column for column in merged.columns if column != 'Ticker']]
+
+    failures = pd.DataFrame([{'Ticker': result['ticker'], 'File': result['file'], 'Error': result['error']} for result in failed],
+        columns=['Ticker', 'File', 'Error'])
+
+    total_rows = sum(result['rows'] for result in succeeded)
+    throughput = []
+    for stage in stage_names:
+        seconds = sum(result['timings'][stage] for result in succeeded)
+        throughput.append({'Stage': stage, 'Tickers': len(succeeded), 'Rows': total_rows, 'Seconds': seconds,
+            'Rows per Second': total_rows / seconds if seconds > 0 else float('nan')})
+    return merged_tables, failures, pd.DataFrame(throughput, columns=['Stage', 'Tickers', 'Rows', 'Seconds', 'Rows per Second'])
+
+
+def run_pipeline(ticker_files, workers=None, k=2):
+    """
+    ticker_files: list of ticker csv paths
+    workers: int/None. Number of worker processes, defaults to the number of cpus
+    k: int/float. The number of standard deviations used for the tails
+    returns: Tuple of a dict of consolidated tables, a failure df and a stage throughput df
+    """
+    ticker_files = list(ticker_files)
+    if workers == 1:
+        results = [analyze_ticker_file(ticker_file, k) for ticker_file in ticker_files]
+    else:
+        worker_count = workers or os.cpu_count() or 1
+        chunksize = max(1, len(ticker_files) // (worker_count * 4))
+        with ProcessPoolExecutor(max_workers=worker_count) as executor:
+            results = list(executor.map(analyze_ticker_file, ticker_files, [k] * len(ticker_files), chunksize=chunksize))
+    return merge_results(results)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description='Run the weekly volatility, normality and last digit analyses for many tickers.')
+    parser.add_argument('ticker_files', nargs='+', help='ticker csv paths or glob patterns, eg. "./data/*.csv"')
+    parser.add_argument('--workers', type=int, default=None, help='number of worker processes, defaults to the number of cpus')
+    parser.add_argument('--output-dir', default='.', help='directory for the consolidated csv files')
+    parser.add_argument('--k', type=float, default=2, help='number of standard deviations used for the tails')
+    args = parser.parse_args(argv)
+
+    ticker_files = find_ticker_files(args.ticker_files)
+    start = time.perf_counter()
+    merged_tables, failures, throughput = run_pipeline(ticker_files, args.workers, args.k)
+    elapsed = time.perf_counter() - start
+
+    os.makedirs(args.output_dir, exist_ok=True)
+    for name, table in merged_tables.items():
+        table.to_csv(os.path.join(args.output_dir, 'all_tickers_{}.csv'.format(name)), index=False)
+    failures.to_csv(os.path.join(args.output_dir, 'all_tickers_failures.csv'), index=False)
+
+    print('Processed {} of {} tickers in {:.2f} seconds'.format(len(ticker_files) - len(failures), len(ticker_files), elapsed))
+    print(throughput.to_string(index=False))
+    if len(failures):
+        print('------------------------------------------')
+        print('{} tickers failed:'.format(len(failures)))
+        for ticker, ticker_file, error in failures.itertuples(index=False):
+            print('{} ({}): {}'.format(ticker, ticker_file, error.strip().splitlines()[-1]))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,176 @@
+# -*- coding: utf-8 -*-
+"""
+@author: rwang
+"""
+import argparse
+import hashlib
+import io
+import os
+from concurrent.futures import ProcessPoolExecutor
+import pandas as pd
+from .instrumentation import instrumented, timed_stage
+from .lazy import load_pyplot
+
+ticker='WMT'
+
+ticker_file = './{}_Labeled.csv'.format(ticker)
+plot_dir = './{}-plots.csv'.format(ticker)
+plot_columns = ['Date','Week_Number','Weekday', 'Day', 'Volume', 'Close']
+
+# This file is meant to visualize the volume and price movement for all the days in the file named
+# {ticker-name}_Labled.csv. In this example, it is WMT_Labeled
+
+
+def split_weeks(df):
+    """
+    df: pd dataframe. Data of interest with a Year_Week column
+    returns: list of (Year_Week, df of the week) in the order the weeks appear, split in a single groupby
+    """
+    return [(week, df_week[plot_columns]) for week, df_week in df.groupby('Year_Week', sort=False)]
+
+
+def plot_week(ticker, df_week):
+    """
+    ticker: string. The ticker name for the title
+    df_week: pd dataframe. The days of a single week
+    returns: matplotlib figure with the volume bars and the close price line for the week
+    """
+    plt = load_pyplot()
+    start_date = df_week['Date'].iloc[0].replace('/', '_')
+    end_date = df_week['Date'].iloc[-1].replace('/', '_')
+
+    fig, ax1 = plt.subplots()
+
+    color = 'tab:blue'
+    ax1.set_xlabel('Volume')
+    ax1.set_ylabel('Volume', color=color)
+    ax1.bar(df_week['Date'],  df_week['Volume'], color=color)
+    ax1.tick_params(axis='y', labelcolor=color)
+
+    ax2 = ax1.twinx()  # instantiate a second axes that shares the same x-axis
+
+    color = 'tab:red'
+    ax2.set_ylabel('Close Price', color=color)
+    ax2.plot(df_week['Date'], df_week['Close'], color=color)
+    ax2.tick_params(axis='y', labelcolor=color)
+
+    plt.grid(True)
+    fig.tight_layout()  # otherwise the right y-label is slightly clipped
+    plt.title('Daily prices for ' + ticker +  ' from ' + start_date + ' to ' + end_date)
+    return fig
+
+
+@instrumented()
+def render_week_page(ticker, df_week):
+    """
+    ticker: string. The ticker name for the title
+    df_week: pd dataframe. The days of a single week
+    returns: bytes of a single page pdf for the week
+    """
+    plt = load_pyplot()
+    fig = plot_week(ticker, df_week)
+    page = io.BytesIO()
+    fig.savefig(page, format='pdf')
+    plt.close(fig)
+    return page.getvalue()
+
+
+def week_hash(ticker, df_week):
+    """
+    ticker: string. The ticker name for the title
+    df_week: pd dataframe. The days of a single week
+    returns: string with a hash of everything drawn on the page
+    """
+    return hashlib.sha256((ticker + '\n' + df_week.to_csv(index=False)).encode()).hexdigest()
+
+
+def render_week_pages(ticker, weeks, cache_dir=None, workers=None):
+    """
+    ticker: string. The ticker name for the titles
+    weeks: list of (Year_Week, df of the week) as returned by split_weeks
+    cache_dir: string/None. Directory of previously rendered pages, None to always render
+    workers: int/None. Number of worker processes, defaults to the number of cpus
+    returns: Tuple of the list of page pdf bytes in week order and the number of pages taken from the cache
+    """
+    hashes = [week_hash(ticker, df_week) for _, df_week in weeks]
+    pages = [None] * len(weeks)
+    if cache_dir is not None:
+        os.makedirs(cache_dir, exist_ok=True)
+        for index, page_hash in enumerate(hashes):
+            cached_file = os.path.join(cache_dir, page_hash + '.pdf')
+            if os.path.exists(cached_file):
+                with open(cached_file, 'rb') as f:
+                    pages[index] = f.read()
+    missing = [index for index, page in enumerate(pages) if page is None]
+
+    if missing:
+        frames = [weeks[index][1] for index in missing]
+        if workers == 1:
+            rendered = [render_week_page(ticker, df_week) for df_week in frames]
+        else:
+            with ProcessPoolExecutor(max_workers=workers) as executor:
+                rendered = list(executor.map(render_week_page, [ticker] * len(frames), frames))
+        for index, page in zip(missing, rendered):
+            pages[index] = page
+            if cache_dir is not None:
+                with open(os.path.join(cache_dir, hashes[index] + '.pdf'), 'wb') as f:
+                    f.write(page)
+    return pages, len(weeks) - len(missing)
+
+
+def create_weekly_pdf(df, ticker, output_file, cache_dir=None, workers=None):
+    """
+    df: pd dataframe. Data of interest with a Year_Week column
+    ticker: string. The ticker name for the titles
+    output_file: string. Path of the pdf with one page per week
+    cache_dir: string/None. Directory of previously rendered pages, None to always render
+    workers: int/None. Number of worker processes, defaults to the number of cpus
+    returns: Tuple of the number of weeks and the number of pages taken from the cache
+    """
+    weeks = split_weeks(df)
+    try:
+        from pypdf import PdfReader, PdfWriter
+    except ImportError:
+        # Without pypdf the pages can not be merged, so draw them one by one into a single pdf
+        plt = load_pyplot()
+        from matplotlib.backends.backend_pdf import PdfPages
+        pdf = PdfPages(output_file)
+        for _, df_week in weeks:
+            fig = plot_week(ticker, df_week)
+            with timed_stage('pdf.savefig', rows=len(df_week)):
+                pdf.savefig(fig)
+            plt.close(fig)
+        pdf.close()
+        return len(weeks), 0
+
+    pages, cached = render_week_pages(ticker, weeks, cache_dir, workers)
+    writer = PdfWriter()
+    for page in pages:
+        writer.append(PdfReader(io.BytesIO(page)))
+    with open(output_file, 'wb') as f:
+        writer.write(f)
+    return len(weeks), cached
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description='Plot the daily volume and close price of every week for labeling.')
+    parser.add_argument('--file', default=ticker_file, help='labeled ticker csv to plot, defaults to %(default)s')
+    parser.add_argument('--ticker', default=ticker, help='ticker name for the titles and file name, defaults to %(default)s')
+    parser.add_argument('--workers', type=int, default=None, help='number of worker processes, defaults to the number of cpus')
+    parser.add_argument('--no-cache', action='store_true', help='render every week even if it was rendered before')
+    args = parser.parse_args(argv)
+    try:
+        df = pd.read_csv(args.file)
+        # For file name sake we replace / with _
+        start_date = df['Date'].iloc[0].replace('/', '_')
+        end_date = df['Date'].iloc[-1].replace('/', '_')
+        output_file = os.path.join(start_date + '_to_' + end_date  + '_prices_' + args.ticker +  '.pdf')
+        total_weeks, cached = create_weekly_pdf(df, args.ticker, output_file, None if args.no_cache else './{}-plot-cache'.format(args.ticker), args.workers)
+        print('Saved {} weeks to {} ({} from cache)'.format(total_weeks, output_file, cached))
+
+    except Exception as e:
+        print('An error occured for ticker: {} with exception : {}'.format(args.ticker, e))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,109 @@
+# -*- coding: utf-8 -*-
+"""
+@author: rwang
+"""
+import os
+import numpy as np
+import pandas as pd
+
+# This file packs many {ticker-name}.csv files into one directory of memory-mapped column arrays.
+# Rows are stored ticker by ticker in date order, so a ticker and date range is a contiguous slice
+# that is found with a binary search and returned without copying.
+
+store_columns = {'Year': 'int32', 'Month': 'int32', 'Day': 'int32', 'Week_Number': 'int32',
+    'Open': 'float64', 'High': 'float64', 'Low': 'float64', 'Close': 'float64', 'Volume': 'float64',
+    'Adj Close': 'float64', 'Return': 'float64'}
+offsets_file_name = 'tickers.csv'
+
+
+def column_file(store_dir, column):
+    """
+    store_dir: string. Directory of the store
+    column: string. Name of the column
+    returns: string with the path of the column array
+    """
+    return os.path.join(store_dir, column.replace(' ', '_') + '.npy')
+
+
+def build_price_store(ticker_files, store_dir):
+    """
+    ticker_files: list of ticker csv paths in the WMT.csv schema, the file name is the ticker
+    store_dir: string. Directory to write the store to
+    returns: df offset table with the following columns: Ticker | Start | Stop
+    """
+    ticker_files = sorted(ticker_files, key=lambda ticker_file: os.path.splitext(os.path.basename(ticker_file))[0])
+    # First pass only counts lines so every column can be allocated once at its final size
+    offsets = []
+    total_rows = 0
+    for ticker_file in ticker_files:
+        with open(ticker_file, 'rb') as f:
+            rows = sum(1 for line in f if line.strip()) - 1
+        offsets.append({'Ticker': os.path.splitext(os.path.basename(ticker_file))[0], 'Start': total_rows, 'Stop': total_rows + rows})
+        total_rows += rows
+
+    os.makedirs(store_dir, exist_ok=True)
+    arrays = {column: np.lib.format.open_memmap(column_file(store_dir, column), mode='w+', dtype=dtype, shape=(total_rows,))
+        for column, dtype in store_columns.items()}
+    arrays['Date'] = np.lib.format.open_memmap(column_file(store_dir, 'Date'), mode='w+', dtype='datetime64[s]', shape=(total_rows,))
+    for ticker_file, offset in zip(ticker_files, offsets):
+        df = pd.read_csv(ticker_file, usecols=['Date'] + list(store_columns))
+        df['Date'] = pd.to_datetime(df['Date'])
+        df = df.sort_values('Date', kind='stable')
+        rows = slice(offset['Start'], offset['Stop'])
+        arrays['Date'][rows] = df['Date'].to_numpy().astype('datetime64[s]')
+        for column in store_columns:
+            arrays[column][rows] = df[column].to_numpy()
+    for array in arrays.values():
+        array.flush()
+
+    offsets = pd.DataFrame(offsets, columns=['Ticker', 'Start', 'Stop'])
+    offsets.to_csv(os.path.join(store_dir, offsets_file_name), index=False)
+    return offsets
+
+
+class PriceStore:
+    """
+    Read-only view of a directory written by build_price_store. The column arrays are memory-mapped,
+    so several processes opening the same store share one copy of the data in the page cache.
+    Pickling a store only sends its directory, the arrays are mapped again in the receiving process.
+    """
+
+    def __init__(self, store_dir):
+        self.store_dir = store_dir
+        offsets = pd.read_csv(os.path.join(store_dir, offsets_file_name))
+        self.offsets = {ticker: (start, stop) for ticker, start, stop in offsets.itertuples(index=False)}
+        self.columns = {column: np.load(column_file(store_dir, column), mmap_mode='r') for column in ['Date'] + list(store_columns)}
+
+    def __getstate__(self):
+        return {'store_dir': self.store_dir}
+
+    def __setstate__(self, state):
+        self.__init__(state['store_dir'])
+
+    @property
+    def tickers(self):
+        return list(self.offsets)
+
+    def row_range(self, ticker, start_date=None, end_date=None):
+        """
+        ticker: string. The ticker name
+        start_date: string/date/None. The first date to include
+        end_date: string/date/None. The last date to include
+        returns: Tuple of the first and one past the last row of the ticker between the dates
+        """
+        start, stop = self.offsets[ticker]
+        dates = self.columns['Date'][start:stop]
+        # Dates are sorted within a ticker, so both ends are a binary search
+        first = 0 if start_date is None else np.searchsorted(dates, np.datetime64(pd.Timestamp(start_date), 's'), side='left')
+        last = len(dates) if end_date is None else np.searchsorted(dates, np.datetime64(pd.Timestamp(end_date), 's'), side='right')
+        return start + int(first), start + int(last)
+
+    def get(self, ticker, start_date=None, end_date=None):
+        """
+        ticker: string. The ticker name
+        start_date: string/date/None. The first date to include
+        end_date: string/date/None. The last date to include
+        returns: df of the ticker between the dates in the WMT.csv schema, the columns are read-only views of the store
+        """
+        first, last = self.row_range(ticker, start_date, end_date)
+        return pd.DataFrame({column: array[first:last] for column, array in self.columns.items()}, copy=False)
@@ -0,0 +1,215 @@
+# -*- coding: utf-8 -*-
+"""
+@author: rwang
+"""
+import argparse
+import os
+import numpy as np
+import pandas as pd
+
+# This file aggregates the daily WMT.csv schema into weekly, monthly, quarterly, yearly or N trading day
+# periods: OHLC bars, volume, the mean and standard deviation of the returns and the positive, negative and
+# mu +/- k sigma tail day counts. The days are sorted once, every period is a contiguous segment and every
+# statistic is one np.*.reduceat over the segment starts. Files are read in chunks; the partial aggregates
+# of the chunks are merged (a period cut by a chunk boundary is combined with Chan's formula), so memory is
+# bounded by the chunk size and the number of periods. The tail counts need the final mu and sigma of every
+# period, so a file is read a second time for them.
+
+ticker='WMT'
+ticker_file = os.path.join('./' + ticker + '.csv')
+# Columns of the period label of every frequency, an integer frequency numbers its periods
+label_columns = {'week': ['Year', 'Week_Number'], 'month': ['Year', 'Month'], 'quarter': ['Year', 'Quarter'], 'year': ['Year']}
+input_columns = ['Date', 'Open', 'High', 'Low', 'Close', 'Volume', 'Return']
+
+
+def period_labels(dates, freq, first_row=0):
+    """
+    dates: numpy datetime64 array. Dates in order
+    freq: string/int. week, month, quarter, year or a number of trading days
+    first_row: int. Number of rows before these dates, so N trading day periods continue across chunks
+    returns: int64 numpy array with one sortable label per period, eg. 201801 for the first week of 2018
+    """
+    if not isinstance(freq, str):
+        return (first_row + np.arange(len(dates))) // int(freq)
+    years = dates.astype('datetime64[Y]')
+    year = years.astype('int64') + 1970
+    if freq == 'year':
+        return year
+    month = dates.astype('datetime64[M]').astype('int64') % 12 + 1
+    if freq == 'month':
+        return year * 100 + month
+    if freq == 'quarter':
+        return year * 10 + (month - 1) // 3 + 1
+    if freq == 'week':
+        days = dates.astype('datetime64[D]')
+        day_of_year = (days - years.astype('datetime64[D]')).astype('int64')
+        # 1970-01-01 was a Thursday, weeks start on Sunday like the Week_Number column (strftime %U)
+        sunday_weekday = (days.astype('int64') + 4) % 7
+        return year * 100 + (day_of_year - sunday_weekday + 7) // 7
+    raise ValueError('unknown frequency {}, use week, month, quarter, year or a number of days'.format(freq))
+
+
+def segment_starts(labels):
+    """
+    labels: numpy array. Period label of every row, equal labels are contiguous
+    returns: numpy array with the first row of every period
+    """
+    return np.concatenate([[0], np.flatnonzero(labels[1:] != labels[:-1]) + 1]).astype('int64')
+
+
+def aggregate_chunk(dates, labels, prices, returns):
+    """
+    dates: numpy datetime64 array. Dates in order
+    labels: numpy array. Period label of every row, as returned by period_labels
+    prices: dict of numpy arrays. Open, High, Low, Close and Volume of every row
+    returns: numpy array. Daily returns as a percentage
+    returns: dict of numpy arrays with the partial aggregate of every period in the chunk
+    """
+    starts = segment_starts(labels)
+    ends = np.append(starts[1:], len(labels)) - 1
+    count = np.diff(np.append(starts, len(labels)))
+    mean = np.add.reduceat(returns, starts) / count
+    segment = np.repeat(np.arange(len(starts)), count)
+    return {'label': labels[starts], 'start': dates[starts], 'end': dates[ends],
+        'Open': prices['Open'][starts], 'High': np.maximum.reduceat(prices['High'], starts),
+        'Low': np.minimum.reduceat(prices['Low'], starts), 'Close': prices['Close'][ends],
+        'Volume': np.add.reduceat(prices['Volume'], starts), 'count': count, 'mean': mean,
+        'M2': np.add.reduceat(np.square(returns - mean[segment]), starts),
+        'positive': np.add.reduceat((returns > 0).astype('int64'), starts),
+        'negative': np.add.reduceat((returns < 0).astype('int64'), starts)}
+
+
+def merge_aggregates(aggregates):
+    """
+    aggregates: list of partial aggregates in date order, as returned by aggregate_chunk
+    returns: dict of numpy arrays with one row per period, periods split between aggregates are combined
+    """
+    stacked = {key: np.concatenate([aggregate[key] for aggregate in aggregates]) for key in aggregates[0]}
+    starts = segment_starts(stacked['label'])
+    if len(starts) == len(stacked['label']):
+        return stacked
+    pieces = np.diff(np.append(starts, len(stacked['label'])))
+    ends = starts + pieces - 1
+    count = np.add.reduceat(stacked['count'], starts)
+    mean = np.add.reduceat(stacked['count'] * stacked['mean'], starts) / count
+    # Chan's parallel merge: M2 = sum of the M2 of the pieces + n_i * (mean_i - mean)^2
+    deviations = stacked['mean'] - np.repeat(mean, pieces)
+    return {'label': stacked['label'][starts], 'start': stacked['start'][starts], 'end': stacked['end'][ends],
+        'Open': stacked['Open'][starts], 'High': np.maximum.reduceat(stacked['High'], starts),
+        'Low': np.minimum.reduceat(stacked['Low'], starts), 'Close': stacked['Close'][ends],
+        'Volume': np.add.reduceat(stacked['Volume'], starts), 'count': count, 'mean': mean,
+        'M2': np.add.reduceat(stacked['M2'] + stacked['count'] * np.square(deviations), starts),
+        'positive': np.add.reduceat(stacked['positive'], starts), 'negative': np.add.reduceat(stacked['negative'], starts)}
+
+
+def read_chunks(data, chunksize=100000, start_date=None, end_date=None):
+    """
+    data: pd dataframe or string. Data in the WMT.csv schema, or the path of such a csv sorted by date
+    chunksize: int. Number of rows read at a time from a csv
+    start_date: string/None. The first date to include, eg. '2014-01-01'
+    end_date: string/None. The last date to include, eg. '2018-12-31'
+    yields: Tuple of the dates, price arrays and returns as a percentage of every chunk, in date order
+    """
+    if isinstance(data, pd.DataFrame):
+        chunks = [data.iloc[np.argsort(pd.to_datetime(data['Date']).to_numpy(), kind='stable')]]
+    else:
+        chunks = pd.read_csv(data, usecols=input_columns, chunksize=chunksize)
+    for chunk in chunks:
+        dates = pd.to_datetime(chunk['Date']).to_numpy()
+        keep = np.ones(len(dates), dtype=bool)
+        if start_date is not None:
+            keep &= dates >= np.datetime64(start_date)
+        if end_date is not None:
+            keep &= dates <= np.datetime64(end_date)
+        if not keep.any():
+            continue
+        prices = {column: chunk[column].to_numpy(dtype='float64')[keep] for column in ['Open', 'High', 'Low', 'Close', 'Volume']}
+        # Return is calculated as a percentage, eg. 0.3 -> 0.3%
+        yield dates[keep], prices, chunk['Return'].to_numpy(dtype='float64')[keep] * 100
+
+
+def count_tails(data, freq, labels, mean, std, k=2, chunksize=100000, start_date=None, end_date=None):
+    """
+    data: pd dataframe or string. The data that was aggregated
+    freq: string/int. The frequency of the aggregation
+    labels: numpy array. Sorted label of every period
+    mean: numpy array. Mean return of every period
+    std: numpy array. Standard deviation of the returns of every period
+    k: int/float. The number of standard deviations used for the tails
+    returns: Tuple of int64 numpy arrays with the days below mu - k * sigma and above mu + k * sigma of every period
+    """
+    below = np.zeros(len(labels), dtype='int64')
+    above = np.zeros(len(labels), dtype='int64')
+    first_row = 0
+    for dates, _, returns in read_chunks(data, chunksize, start_date, end_date):
+        period = np.searchsorted(labels, period_labels(dates, freq, first_row))
+        first_row += len(dates)
+        below += np.bincount(period, returns < mean[period] - k * std[period], minlength=len(labels)).astype('int64')
+        above += np.bincount(period, returns > mean[period] + k * std[period], minlength=len(labels)).astype('int64')
+    return below, above
+
+
+def resample(data, freq='week', k=2, chunksize=100000, start_date=None, end_date=None):
+    """
+    data: pd dataframe or string. Data in the WMT.csv schema, or the path of such a csv sorted by date
+    freq: string/int. week, month, quarter, year or a number of trading days
+    k: int/float. The number of standard deviations used for the tails
+    chunksize: int. Number of rows read at a time from a csv, memory is bounded by this and the number of periods
+    start_date: string/None. The first date to include, eg. '2014-01-01'
+    end_date: string/None. The last date to include, eg. '2018-12-31'
+    returns: df with one row per period: the label columns | start | end | Open | High | Low | Close | Volume |
+        Trading Days | mean_return | volatility | Positive Days | Negative Days | days < mu - k * sigma | days > mu + k * sigma
+    """
+    aggregates = []
+    first_row = 0
+    for dates, prices, returns in read_chunks(data, chunksize, start_date, end_date):
+        aggregates.append(aggregate_chunk(dates, period_labels(dates, freq, first_row), prices, returns))
+        first_row += len(dates)
+    if not aggregates:
+        raise ValueError('no rows between {} and {}'.format(start_date, end_date))
+    periods = merge_aggregates(aggregates)
+    count = periods['count']
+    # Sample standard deviation, periods with a single day have no volatility
+    std = np.sqrt(periods['M2'] / np.where(count > 1, count - 1, 1)) * (count > 1)
+    below, above = count_tails(data, freq, periods['label'], periods['mean'], std, k, chunksize, start_date, end_date)
+
+    label = periods['label']
+    if not isinstance(freq, str):
+        table = pd.DataFrame({'Period': label})
+    elif freq == 'year':
+        table = pd.DataFrame({'Year': label})
+    else:
+        table = pd.DataFrame({'Year': label // (10 if freq == 'quarter' else 100), label_columns[freq][1]: label % (10 if freq == 'quarter' else 100)})
+    for key in ['start', 'end', 'Open', 'High', 'Low', 'Close', 'Volume']:
+        table[key] = periods[key]
+    table['Trading Days'] = count
+    table['mean_return'] = periods['mean']
+    table['volatility'] = std
+    table['Positive Days'] = periods['positive']
+    table['Negative Days'] = periods['negative']
+    table['days < mu - {} * sigma'.format(k)] = below
+    table['days > mu + {} * sigma'.format(k)] = above
+    return table
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description='Aggregate the daily prices and returns into weekly, monthly, quarterly, yearly or N day periods.')
+    parser.add_argument('--file', default=ticker_file, help='ticker csv sorted by date, defaults to %(default)s')
+    parser.add_argument('--freq', default='week', help='week, month, quarter, year or a number of trading days, defaults to %(default)s')
+    parser.add_argument('--k', type=float, default=2, help='number of standard deviations used for the tails')
+    parser.add_argument('--chunksize', type=int, default=100000, help='rows read at a time')
+    parser.add_argument('--start', default=None, help='first date, eg. 2014-01-01')
+    parser.add_argument('--end', default=None, help='last date, eg. 2018-12-31')
+    parser.add_argument('--output', default=None, help='csv to write the periods to, printed when not given')
+    args = parser.parse_args(argv)
+    freq = int(args.freq) if args.freq.isdigit() else args.freq
+    table = resample(args.file, freq, args.k, args.chunksize, args.start, args.end)
+    if args.output is None:
+        print(table.to_string(index=False))
+    else:
+        table.to_csv(args.output, index=False)
+        print('Wrote {} periods to {}'.format(len(table), args.output))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,248 @@
+# -*- coding: utf-8 -*-
+"""
+@author: rwang
+"""
+from math import comb
+import numpy as np
+import pandas as pd
+
+# This file computes trailing window statistics for every day of one or many tickers in O(rows) for any
+# window size. Every ticker is cut into blocks of window rows, so a trailing window is its own block up to
+# the day plus the end of the previous block. Both parts are running sums that restart in every block, one
+# from the block start and one from the block end, so a window only ever adds its own days: nothing leaks
+# between tickers or from days that left the window. The power sums behind the moments are taken around
+# the first day of the window's block, which is in every window ending in that block.
+
+short_ma_window = 14
+long_ma_window = 50
+
+
+def group_starts(group_ids):
+    """
+    group_ids: numpy array. Ticker code of every row, rows of a ticker are contiguous and in date order
+    returns: numpy array with the first row of the ticker of every row
+    """
+    index = np.arange(len(group_ids))
+    is_group_start = np.ones(len(group_ids), dtype=bool)
+    is_group_start[1:] = group_ids[1:] != group_ids[:-1]
+    # First row of every ticker, carried forward over the ticker's rows
+    return np.maximum.accumulate(np.where(is_group_start, index, 0))
+
+
+def window_starts(group_ids, window):
+    """
+    group_ids: numpy array. Ticker code of every row, rows of a ticker are contiguous and in date order
+    window: int. Number of trailing rows in the window
+    returns: numpy array with the first row of the window ending at every row, windows never cross tickers
+    """
+    return np.maximum(np.arange(len(group_ids)) - window + 1, group_starts(group_ids))
+
+
+def window_blocks(group_ids, window):
+    """
+    group_ids: numpy array. Ticker code of every row, rows of a ticker are contiguous and in date order
+    window: int. Number of trailing rows in the window, also the number of rows per block
+    returns: Tuple of the block of every row, the offset of the row in its block, the number of blocks and a
+        bool array telling which rows have a previous block of the same ticker
+    """
+    position = np.arange(len(group_ids)) - group_starts(np.asarray(group_ids))
+    offset = position % window
+    block = np.cumsum(offset == 0) - 1
+    return block, offset, int(block[-1]) + 1 if len(block) else 0, position >= window
+
+
+def block_window_sums(own_values, previous_values, blocks, window):
+    """
+    own_values: numpy array. Value of every row as added to the windows ending in its own block
+    previous_values: numpy array. Value of every row as added to the windows ending in the next block
+    blocks: Tuple as returned by window_blocks
+    window: int. Number of trailing rows in the window
+    returns: numpy array with the sum of every trailing window
+    """
+    block, offset, n_blocks, has_previous = blocks
+    # One row per block, the extra last column stays 0 for windows that start at a block start
+    table = np.zeros((n_blocks, window + 1))
+    table[block, offset] = own_values
+    sums = np.cumsum(table, axis=1)[block, offset]
+    table[block, offset] = previous_values
+    # The window ending at offset o starts at offset o + 1 of the previous block, summed from the block end
+    from_end = np.cumsum(table[:, ::-1], axis=1)[:, ::-1]
+    sums[has_previous] += from_end[block[has_previous] - 1, offset[has_previous] + 1]
+    return sums
+
+
+def window_sums(values, group_ids, window):
+    """
+    values: numpy array. Values in row order
+    group_ids: numpy array. Ticker code of every row, rows of a ticker are contiguous and in date order
+    window: int. Number of trailing rows in the window
+    returns: numpy array with the sum of every trailing window
+    """
+    values = np.asarray(values, dtype='float64')
+    return block_window_sums(values, values, window_blocks(group_ids, window), window)
+
+
+def block_anchors(values, valid, group_ids, block, offset, n_blocks):
+    """
+    values: numpy array. Values in row order
+    valid: numpy array. Bool mask of the values that are not NaN
+    group_ids: numpy array. Ticker code of every row
+    block: numpy array. Block of every row, as returned by window_blocks
+    offset: numpy array. Offset of every row in its block
+    n_blocks: int. Number of blocks
+    returns: numpy array with the value every block is centered on: its first value, the last value of the ticker
+        before it when that is NaN, else the next one
+    """
+    size = len(values)
+    index = np.arange(size)
+    last_valid = np.maximum.accumulate(np.where(valid, index, -1))
+    next_valid = np.minimum.accumulate(np.where(valid, index, size)[::-1])[::-1]
+    first_rows = index[offset == 0]
+    last_valid = last_valid[first_rows]
+    next_valid = next_valid[first_rows]
+    anchors = np.zeros(n_blocks)
+    earlier = (last_valid >= 0) & (group_ids[np.maximum(last_valid, 0)] == group_ids[first_rows])
+    later = ~earlier & (next_valid < size)
+    later &= group_ids[np.minimum(next_valid, size - 1)] == group_ids[first_rows]
+    anchors[earlier] = values[last_valid[earlier]]
+    anchors[later] = values[next_valid[later]]
+    return anchors
+
+
+def shift_power_sums(sums, delta):
+    """
+    sums: list of numpy arrays. Sums of the 0th to 4th powers of the values around some center
+    delta: numpy array. How far to move the center, the values become values + delta
+    returns: list of numpy arrays with the power sums of the values + delta
+    """
+    return [sum(comb(power, lower) * delta ** (power - lower) * sums[lower] for lower in range(power + 1))
+        for power in range(len(sums))]
+
+
+def rolling_moments(values, group_ids, window, min_periods=None, bias=False):
+    """
+    values: numpy array. Values in row order, NaN values are left out of the windows
+    group_ids: numpy array. Ticker code of every row, rows of a ticker are contiguous and in date order
+    window: int. Number of trailing rows in the window
+    min_periods: int/None. Fewest values for a result, defaults to the window size
+    bias: bool. Return the biased (population) skew and excess kurtosis, as used by the Jarque-Bera test
+    returns: dict of numpy arrays with the count, mean, std, skew and kurtosis of every trailing window
+    """
+    min_periods = window if min_periods is None else min_periods
+    values = np.asarray(values, dtype='float64')
+    group_ids = np.asarray(group_ids)
+    valid = ~np.isnan(values)
+    blocks = window_blocks(group_ids, window)
+    block, offset, n_blocks, _ = blocks
+    anchors = block_anchors(values, valid, group_ids, block, offset, n_blocks)
+    # A row is centered on the anchor of its own block, and on the anchor of the next block for the windows
+    # ending there, so every window adds deviations from one value inside it
+    own = np.where(valid, values - anchors[block], 0)
+    previous = np.where(valid, values - anchors[np.minimum(block + 1, max(n_blocks - 1, 0))], 0)
+    count = block_window_sums(valid, valid, blocks, window)
+    sums = [count] + [block_window_sums(own ** power, previous ** power, blocks, window) for power in range(1, 5)]
+
+    with np.errstate(divide='ignore', invalid='ignore'):
+        mean_offset = sums[1] / count
+        # Central power sums around the mean of every window
+        central = shift_power_sums(sums, -mean_offset)
+        m2 = np.maximum(central[2] / count, 0)
+        m3 = central[3] / count
+        m4 = central[4] / count
+        std = np.sqrt(m2 * count / (count - 1))
+        skew = m3 / m2 ** 1.5
+        kurtosis = m4 / m2 ** 2 - 3
+        if not bias:
+            # Bias corrected sample skewness and excess kurtosis, the same estimators as pandas
+            skew = np.sqrt(count * (count - 1)) / (count - 2) * skew
+            kurtosis = (count - 1) / ((count - 2) * (count - 3)) * ((count + 1) * kurtosis + 6)
+    enough = count >= min_periods
+    return {'count': count,
+        'mean': np.where(enough, anchors[block] + mean_offset, np.nan),
+        'std': np.where(enough & (count > 1), std, np.nan),
+        'skew': np.where(enough & (count > 2) & (m2 > 0), skew, np.nan),
+        'kurtosis': np.where(enough & (count > 3) & (m2 > 0), kurtosis, np.nan)}
+
+
+def rolling_tail_counts(values, group_ids, window, mean, std, k=2):
+    """
+    values: numpy array. Values in row order
+    group_ids: numpy array. Ticker code of every row, rows of a ticker are contiguous and in date order
+    window: int. Number of trailing rows in the window
+    mean: numpy array. Trailing mean at every row, as returned by rolling_moments
+    std: numpy array. Trailing std at every row, as returned by rolling_moments
+    k: int/float. The number of standard deviations for the tails
+    returns: Tuple of numpy arrays with the days in every trailing window that were below their own trailing
+        mu - k * sigma and above their own trailing mu + k * sigma
+    """
+    values = np.asarray(values, dtype='float64')
+    # A day is in a tail when it is beyond the mu +/- k * sigma of the window ending on that day
+    with np.errstate(invalid='ignore'):
+        below = (values < mean - k * std).astype('float64')
+        above = (values > mean + k * std).astype('float64')
+    return window_sums(below, group_ids, window), window_sums(above, group_ids, window)
+
+
+def ticker_date_order(df, by='Ticker'):
+    """
+    df: pd dataframe. Data with a Date column, optionally stacked for many tickers
+    by: string. The column that separates tickers, ignored when it is not in df
+    returns: Tuple of the row order that sorts by ticker then date and the ticker code of every sorted row
+    """
+    if by not in df.columns:
+        return np.argsort(df['Date'].to_numpy(), kind='stable'), np.zeros(len(df), dtype='int64')
+    codes = pd.factorize(df[by])[0]
+    order = np.lexsort((df['Date'].to_numpy(), codes))
+    return order, codes[order]
+
+
+def add_rolling_statistics(df, window=20, k=2, column='Return', by='Ticker'):
+    """
+    df: pd dataframe. Data in the WMT.csv schema, optionally stacked for many tickers with a Ticker column
+    window: int. Number of trailing trading days in the window
+    k: int/float. The number of standard deviations for the tail counts
+    column: string. The column to compute the statistics of
+    by: string. The column that separates tickers, ignored when it is not in df
+    returns: df with the rolling mean, std, skew, kurtosis and tail counts added, in the original row order
+    """
+    order, group_ids = ticker_date_order(df, by)
+    values = df[column].to_numpy(dtype='float64')[order]
+
+    moments = rolling_moments(values, group_ids, window)
+    below, above = rolling_tail_counts(values, group_ids, window, moments['mean'], moments['std'], k)
+    enough = moments['count'] >= window
+    statistics = {
+        'Rolling_Mean_{}'.format(window): moments['mean'],
+        'Rolling_Std_{}'.format(window): moments['std'],
+        'Rolling_Skew_{}'.format(window): moments['skew'],
+        'Rolling_Kurtosis_{}'.format(window): moments['kurtosis'],
+        'Rolling_Below_{}_Sigma_{}'.format(k, window): np.where(enough, below, np.nan),
+        'Rolling_Above_{}_Sigma_{}'.format(k, window): np.where(enough, above, np.nan)}
+
+    df = df.copy()
+    for name, sorted_values in statistics.items():
+        # Scatter back from the sorted order to the original rows
+        unsorted_values = np.empty_like(sorted_values)
+        unsorted_values[order] = sorted_values
+        df[name] = unsorted_values
+    return df
+
+
+def add_moving_averages(df, short_window=short_ma_window, long_window=long_ma_window, by='Ticker'):
+    """
+    df: pd dataframe. Data in the WMT.csv schema, optionally stacked for many tickers with a Ticker column
+    short_window: int. Number of trading days in the short moving average
+    long_window: int. Number of trading days in the long moving average
+    by: string. The column that separates tickers, ignored when it is not in df
+    returns: df with the Short_MA and Long_MA columns of the Close price recomputed, like the ones in WMT.csv
+    """
+    order, group_ids = ticker_date_order(df, by)
+    close = df['Close'].to_numpy(dtype='float64')[order]
+    df = df.copy()
+    for name, window in [('Short_MA', short_window), ('Long_MA', long_window)]:
+        # The first days of a ticker average over the days available so far
+        moving_average = window_sums(close, group_ids, window) / (np.arange(len(close)) + 1 - window_starts(group_ids, window))
+        unsorted_values = np.empty_like(moving_average)
+        unsorted_values[order] = moving_average
+        df[name] = unsorted_values
+    return df
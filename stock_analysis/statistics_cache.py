@@ -0,0 +1,178 @@
+# -*- coding: utf-8 -*-
+"""
+@author: rwang
+"""
+import sys
+from collections import OrderedDict
+import numpy as np
+import pandas as pd
+
+# This file keeps date range slices of the ticker data and the statistics computed from them (mean, std,
+# day counts, digit histograms) in a size bounded LRU cache. Entries are keyed on
+# (dataset, ticker, start, end, statistic), so asking for the same year or range again, from the same or
+# another function, is a dictionary lookup. The dataset key is given by the caller, eg. the sha256 of the
+# csv from loader.file_fingerprint; without one nothing is cached. A dataframe changed in place has to be
+# passed with a new dataset key.
+
+
+def entry_size(value):
+    """
+    value: a cached slice or statistic
+    returns: int with the approximate number of bytes the value holds
+    """
+    if isinstance(value, (pd.DataFrame, pd.Series)):
+        size = value.memory_usage(deep=True)
+        return int(size.sum()) if isinstance(size, pd.Series) else int(size)
+    if isinstance(value, np.ndarray):
+        return value.nbytes
+    if isinstance(value, (tuple, list)):
+        return sys.getsizeof(value) + sum(entry_size(item) for item in value)
+    return sys.getsizeof(value)
+
+
+class StatisticsCache:
+    """
+    Least recently used cache of slices and statistics bounded by the total size of its entries
+    """
+
+    def __init__(self, max_bytes=256 * 2 ** 20, max_entries=None):
+        """
+        max_bytes: int. The entries are evicted oldest first once their sizes add up to more than this
+        max_entries: int/None. Optional bound on the number of entries
+        """
+        self.max_bytes = max_bytes
+        self.max_entries = max_entries
+        self.entries = OrderedDict()
+        self.total_bytes = 0
+        self.hits = 0
+        self.misses = 0
+
+    def __len__(self):
+        return len(self.entries)
+
+    def __contains__(self, key):
+        return key in self.entries
+
+    def get(self, key, default=None):
+        """
+        key: tuple. (dataset, ticker, start, end, statistic)
+        returns: the cached value, or default when it is not cached
+        """
+        entry = self.entries.get(key)
+        if entry is None:
+            self.misses += 1
+            return default
+        self.hits += 1
+        self.entries.move_to_end(key)
+        return entry[0]
+
+    def put(self, key, value):
+        """
+        key: tuple. (dataset, ticker, start, end, statistic)
+        value: the slice or statistic to keep, values larger than the whole cache are not kept
+        """
+        size = entry_size(value)
+        if key in self.entries:
+            self.total_bytes -= self.entries.pop(key)[1]
+        if size > self.max_bytes:
+            return
+        self.entries[key] = (value, size)
+        self.total_bytes += size
+        while self.total_bytes > self.max_bytes or (self.max_entries is not None and len(self.entries) > self.max_entries):
+            _, (_, evicted_size) = self.entries.popitem(last=False)
+            self.total_bytes -= evicted_size
+
+    def get_or_compute(self, key, compute):
+        """
+        key: tuple. (dataset, ticker, start, end, statistic)
+        compute: function without arguments that returns the value on a miss
+        returns: the cached or newly computed value
+        """
+        entry = self.entries.get(key)
+        if entry is not None:
+            self.hits += 1
+            self.entries.move_to_end(key)
+            return entry[0]
+        self.misses += 1
+        value = compute()
+        self.put(key, value)
+        return value
+
+    def clear(self):
+        self.entries.clear()
+        self.total_bytes = 0
+
+    def info(self):
+        """
+        returns: dict with the hits, misses, number of entries and their total size
+        """
+        return {'hits': self.hits, 'misses': self.misses, 'entries': len(self.entries), 'bytes': self.total_bytes,
+            'max_bytes': self.max_bytes}
+
+
+default_cache = StatisticsCache()
+
+
+def year_bounds(year):
+    """
+    year: int/string. A year
+    returns: Tuple of the first and last date of the year as strings
+    """
+    return str(year) + '-01-01', str(year) + '-12-31'
+
+
+def date_range_slice(df, start_date, end_date, dataset=None, ticker=None, cache=None):
+    """
+    df: pd dataframe. Data of interest with a Date column
+    start_date: string. First date of the range, eg. 2018-01-01
+    end_date: string. Last date of the range, eg. 2018-12-31
+    dataset: string/None. Key of the data in df, eg. the sha256 of its csv, None to slice without caching
+    ticker: string/None. Ticker of the data, only part of the key
+    cache: StatisticsCache/None. Defaults to the shared default_cache
+    returns: df of the rows between the two dates. It is shared with later callers, copy it before changing it
+    """
+    compute = lambda: df.loc[(df['Date'] >= start_date) & (df['Date'] <= end_date)]  # noqa: E731
+    if dataset is None:
+        return compute()
+    cache = default_cache if cache is None else cache
+    return cache.get_or_compute((dataset, ticker, start_date, end_date, 'slice'), compute)
+
+
+def daily_returns_counts(returns_list):
+    """
+    returns_list: pd series. Returns as a percentage
+    returns: dict with the trading days, positive days and negative days
+    """
+    returns = returns_list.to_numpy()
+    return {'Trading Days': returns.size, 'positive': int(np.count_nonzero(returns > 0)),
+        'negative': int(np.count_nonzero(returns < 0))}
+
+
+# Statistics of the Return column (as a percentage, eg. 0.3 -> 0.3%) that cached_statistic knows by name
+return_statistics = {
+    'mean': lambda returns_list: np.divide(returns_list.sum(), returns_list.size),
+    'std': lambda returns_list: returns_list.std(),
+    'counts': daily_returns_counts,
+}
+
+
+def cached_statistic(df, start_date, end_date, statistic, compute=None, dataset=None, ticker=None, cache=None):
+    """
+    df: pd dataframe. Data of interest with a Date column
+    start_date: string. First date of the range
+    end_date: string. Last date of the range
+    statistic: string. Name of the statistic, one of return_statistics unless compute is given
+    compute: function/None. Computes the statistic from the df of the date range
+    dataset: string/None. Key of the data in df, eg. the sha256 of its csv, None to compute without caching
+    ticker: string/None. Ticker of the data, only part of the key
+    cache: StatisticsCache/None. Defaults to the shared default_cache
+    returns: the statistic of the date range, computed only the first time it is asked for with the same dataset
+    """
+    if compute is None:
+        return_statistic = return_statistics[statistic]
+        compute = lambda df_range: return_statistic(df_range['Return'] * 100)  # noqa: E731
+    if dataset is None:
+        return compute(date_range_slice(df, start_date, end_date))
+    cache = default_cache if cache is None else cache
+    key = (dataset, ticker, start_date, end_date, statistic)
+    return cache.get_or_compute(key, lambda: compute(date_range_slice(df, start_date, end_date, dataset, ticker, cache)))
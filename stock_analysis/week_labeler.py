@@ -0,0 +1,165 @@
+# -*- coding: utf-8 -*-
+"""
+@author: rwang
+"""
+import argparse
+import os
+import numpy as np
+import pandas as pd
+from .loader import load_ticker_csv
+
+ticker='WMT'
+ticker_file = os.path.join('./' + ticker + '_Labeled_Weeks_Self.csv')
+week_keys = ['Year', 'Week_Number']
+feature_columns = ['mean_return', 'volatility', 'ma_spread']
+
+# This file labels every week GREEN or RED from the weekly mean return, volatility and the
+# Short_MA/Long_MA crossover, for all tickers at once, and compares the labels with the hand
+# labels in {ticker-name}_Labeled_Weeks_Self.csv.
+
+
+def weekly_features(df, by='Ticker'):
+    """
+    df: pd dataframe. Data in the WMT.csv schema, optionally stacked for many tickers with a Ticker column
+    by: string. The column that separates tickers, ignored when it is not in df
+    returns: df with one row per (ticker,) year and week: mean_return | volatility | ma_spread
+        mean_return and volatility are the same as in WMT_weekly_return_volatility.csv, ma_spread is
+        (Short_MA - Long_MA) / Long_MA on the last day of the week in percent
+    """
+    keys = [by] + week_keys if by in df.columns else list(week_keys)
+    df = df.sort_values(keys[:-2] + ['Date'], kind='stable')
+    adj_close = df['Adj Close']
+    previous = adj_close.groupby(df[by]).shift(1) if by in df.columns else adj_close.shift(1)
+    returns = (100.0 * (adj_close / previous - 1).fillna(0)).round(3)
+    ma_spread = 100.0 * (df['Short_MA'] - df['Long_MA']) / df['Long_MA']
+    grouped = pd.DataFrame({'Return': returns, 'ma_spread': ma_spread}).groupby([df[key] for key in keys], sort=True)
+    features = grouped['Return'].agg(['mean', 'std']).rename(columns={'mean': 'mean_return', 'std': 'volatility'})
+    features['volatility'] = features['volatility'].fillna(0)
+    features['ma_spread'] = grouped['ma_spread'].last()
+    return features.reset_index()
+
+
+def label_weeks_by_rule(features, min_mean_return=0, max_volatility=None, use_ma_crossover=False):
+    """
+    features: df of weekly features as returned by weekly_features
+    min_mean_return: int/float. Weeks need a mean daily return in percent above this to be GREEN
+    max_volatility: int/float/None. Weeks more volatile than this are RED, None for no limit
+    use_ma_crossover: bool. Weeks also need the Short_MA above the Long_MA to be GREEN
+    returns: numpy array of GREEN/RED labels, one per row of features
+    """
+    green = features['mean_return'].to_numpy() > min_mean_return
+    if max_volatility is not None:
+        green &= features['volatility'].to_numpy() <= max_volatility
+    if use_ma_crossover:
+        green &= features['ma_spread'].to_numpy() > 0
+    return np.where(green, 'GREEN', 'RED')
+
+
+def fit_week_label_model(features, labels, iterations=25, l2_penalty=1e-3):
+    """
+    features: df of weekly features as returned by weekly_features
+    labels: array like of GREEN/RED labels, one per row of features
+    iterations: int. Number of Newton steps
+    l2_penalty: float. Ridge penalty that keeps the fit finite when the classes separate
+    returns: dict with the feature means, scales and logistic regression weights
+    """
+    x = features[feature_columns].to_numpy(dtype='float64')
+    y = (np.asarray(labels) == 'GREEN').astype('float64')
+    mean = x.mean(axis=0)
+    scale = np.where(x.std(axis=0) > 0, x.std(axis=0), 1)
+    design = np.column_stack([np.ones(len(x)), (x - mean) / scale])
+    weights = np.zeros(design.shape[1])
+    penalty = l2_penalty * np.eye(design.shape[1])
+    penalty[0, 0] = 0
+    for _ in range(iterations):
+        # Newton's method on the penalized log likelihood, every week is one row of the design matrix
+        probability = 1 / (1 + np.exp(-design @ weights))
+        gradient = design.T @ (y - probability) - penalty @ weights
+        hessian = (design * (probability * (1 - probability))[:, None]).T @ design + penalty
+        step = np.linalg.solve(hessian, gradient)
+        weights += step
+        if np.max(np.abs(step)) < 1e-10:
+            break
+    return {'mean': mean, 'scale': scale, 'weights': weights}
+
+
+def predict_week_labels(model, features, threshold=0.5):
+    """
+    model: dict as returned by fit_week_label_model
+    features: df of weekly features as returned by weekly_features
+    threshold: float. Probability of GREEN above which a week is labeled GREEN
+    returns: numpy array of GREEN/RED labels, one per row of features
+    """
+    x = (features[feature_columns].to_numpy(dtype='float64') - model['mean']) / model['scale']
+    probability = 1 / (1 + np.exp(-(model['weights'][0] + x @ model['weights'][1:])))
+    return np.where(probability > threshold, 'GREEN', 'RED')
+
+
+def broadcast_week_labels(df, features, labels, by='Ticker', column='Classification'):
+    """
+    df: pd dataframe. Daily data, optionally stacked for many tickers with a Ticker column
+    features: df of weekly features as returned by weekly_features
+    labels: array like of GREEN/RED labels, one per row of features
+    by: string. The column that separates tickers, ignored when it is not in df
+    column: string. Name of the label column added to the daily rows
+    returns: df of the daily rows with the label of their week
+    """
+    keys = [by] + week_keys if by in df.columns else list(week_keys)
+    week_labels = features[keys].assign(**{column: labels})
+    return df.drop(columns=[column], errors='ignore').merge(week_labels, on=keys, how='left')
+
+
+def hand_week_labels(df, features, by='Ticker', column='Classification'):
+    """
+    df: pd dataframe. Daily data with hand labels, eg. WMT_Labeled_Weeks_Self.csv
+    features: df of weekly features as returned by weekly_features
+    by: string. The column that separates tickers, ignored when it is not in df
+    column: string. Name of the hand label column
+    returns: numpy array of the hand label of every row of features
+    """
+    keys = [by] + week_keys if by in df.columns else list(week_keys)
+    labels = df.groupby(keys, sort=True, observed=True)[column].first().astype(str)
+    return features[keys].merge(labels.reset_index(), on=keys, how='left')[column].to_numpy()
+
+
+def label_agreement(predicted, hand):
+    """
+    predicted: array like of GREEN/RED labels
+    hand: array like of GREEN/RED hand labels for the same weeks
+    returns: Tuple of the fraction of weeks that agree and the confusion table (hand labels as rows)
+    """
+    predicted = pd.Series(np.asarray(predicted), name='Predicted')
+    hand = pd.Series(np.asarray(hand), name='Hand')
+    return np.mean(predicted.to_numpy() == hand.to_numpy()), pd.crosstab(hand, predicted)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description='Label weeks GREEN or RED and compare with the hand labels.')
+    parser.add_argument('--file', default=ticker_file, help='ticker csv to analyze, defaults to %(default)s')
+    args = parser.parse_args(argv)
+    df = load_ticker_csv(args.file)
+    features = weekly_features(df)
+    hand = hand_week_labels(df, features)
+
+    print('Rule: GREEN when the mean daily return of the week is positive')
+    agreement, confusion = label_agreement(label_weeks_by_rule(features), hand)
+    print('Agreement with the hand labels: {:.2%}'.format(agreement))
+    print(confusion)
+    print('------------------------------------------')
+    print('Rule: GREEN when the mean daily return is positive and the Short_MA is above the Long_MA')
+    agreement, confusion = label_agreement(label_weeks_by_rule(features, use_ma_crossover=True), hand)
+    print('Agreement with the hand labels: {:.2%}'.format(agreement))
+    print(confusion)
+    print('------------------------------------------')
+    # Fit on the first year and check on the second so the agreement is not measured on the training weeks
+    train = (features['Year'] == features['Year'].min()).to_numpy()
+    model = fit_week_label_model(features[train], hand[train])
+    predicted = predict_week_labels(model, features)
+    print('Model: logistic regression fitted on {} and checked on the later weeks'.format(features['Year'].min()))
+    agreement, confusion = label_agreement(predicted[~train], hand[~train])
+    print('Agreement with the hand labels: {:.2%}'.format(agreement))
+    print(confusion)
+
+
+if __name__ == "__main__":
+    main()
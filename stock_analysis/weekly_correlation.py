@@ -0,0 +1,340 @@
+# -*- coding: utf-8 -*-
+"""
+@author: rwang
+"""
+import argparse
+import json
+import os
+import numpy as np
+import pandas as pd
+from .loader import load_ticker_csv
+from .weekly_return_volatility import weekly_return_volatility, week_keys
+
+# This file compares the weekly mean return and volatility of many tickers. The weekly tables are aligned
+# into a dense (weeks x tickers) array with a mask of the weeks a ticker has, and the pairwise sums behind
+# the correlation and covariance (over the weeks both tickers have) are four matrix products per block of
+# tickers. The sums are kept in PairwiseMoments, so new weeks are added without recomputing the old ones
+# (the last week may still be open, so its row is kept and replaced by the next update), and they can live in memory-mapped .npy files so 10k tickers do not have to fit in memory. Weeks are also
+# clustered into volatility regimes from the volatility of all tickers in the week.
+
+ticker='WMT'
+ticker_file = os.path.join('./' + ticker + '.csv')
+statistic_names = ['n', 'sx', 'sxx', 'sxy']
+tickers_file_name = 'tickers.csv'
+state_file_name = 'state.json'
+weekly_table_suffix = '_weekly_return_volatility'
+
+
+def weekly_panel(weekly, value='mean_return', tickers=None, by='Ticker'):
+    """
+    weekly: pd dataframe. Stacked weekly tables: Ticker | Year | Week_Number | mean_return | volatility
+    value: string. The column to align, mean_return or volatility
+    tickers: list/None. Order of the first tickers, eg. the tickers already in a PairwiseMoments, new ones follow
+    by: string. The column with the ticker
+    returns: Tuple of the weeks df (Year | Week_Number), the list of tickers, the (weeks x tickers) float64
+        values with 0 for missing weeks and the (weeks x tickers) bool mask of the weeks each ticker has.
+        Raises ValueError when a ticker has a week more than once, eg. the same ticker loaded from two files
+    """
+    week_labels = weekly['Year'].to_numpy().astype('int64') * 100 + weekly['Week_Number'].to_numpy().astype('int64')
+    duplicated = pd.DataFrame({'Ticker': weekly[by].astype(str).to_numpy(), 'Week': week_labels}).duplicated(keep=False).to_numpy()
+    if duplicated.any():
+        repeated = weekly.loc[duplicated, [by, 'Year', 'Week_Number']].drop_duplicates()
+        raise ValueError('{} (ticker, week) rows are given more than once, eg. {}'.format(
+            len(repeated), ', '.join('{} {}-{}'.format(*row) for row in repeated.head(3).itertuples(index=False))))
+    weeks, week_index = np.unique(week_labels, return_inverse=True)
+    known = list(tickers) if tickers is not None else []
+    new_tickers = sorted(set(weekly[by].astype(str)) - set(known))
+    tickers = known + new_tickers
+    ticker_index = pd.Index(tickers).get_indexer(weekly[by].astype(str))
+    values = np.zeros((len(weeks), len(tickers)))
+    mask = np.zeros((len(weeks), len(tickers)), dtype=bool)
+    observed = ~np.isnan(weekly[value].to_numpy(dtype='float64'))
+    values[week_index[observed], ticker_index[observed]] = weekly[value].to_numpy(dtype='float64')[observed]
+    mask[week_index[observed], ticker_index[observed]] = True
+    return pd.DataFrame({'Year': weeks // 100, 'Week_Number': weeks % 100}), tickers, values, mask
+
+
+def blocks(size, block_size):
+    """
+    size: int. Number of tickers
+    block_size: int. Number of tickers per block
+    returns: list of slices that cover the tickers
+    """
+    return [slice(start, min(start + block_size, size)) for start in range(0, size, block_size)]
+
+
+class PairwiseMoments:
+    """
+    Sums over the weeks two tickers both have: n (weeks), sx (sum of the row ticker), sxx (sum of squares
+    of the row ticker) and sxy (sum of products). The values are shifted by a per ticker constant first so
+    the sums do not lose precision. Each is a (tickers x tickers) matrix, on disk when a store_dir is given.
+    """
+
+    def __init__(self, store_dir=None, block_size=1024):
+        """
+        store_dir: string/None. Directory of the .npy matrices, None keeps them in memory
+        block_size: int. Tickers per tile, a tile product needs about weeks * block_size * 8 * 4 bytes
+        """
+        self.store_dir = store_dir
+        self.block_size = block_size
+        self.tickers = []
+        self.shift = np.zeros(0)
+        self.last_week = None
+        # Values and mask of every ticker in last_week, taken out again when the week is updated
+        self.last_values = np.zeros(0)
+        self.last_mask = np.zeros(0, dtype=bool)
+        self.matrices = {name: np.zeros((0, 0)) for name in statistic_names}
+
+    @classmethod
+    def load(cls, store_dir, block_size=1024):
+        """
+        store_dir: string. Directory written by save or by updates of a PairwiseMoments with this store_dir
+        block_size: int. Tickers per tile
+        returns: PairwiseMoments with its matrices memory-mapped from store_dir
+        """
+        moments = cls(store_dir, block_size)
+        moments.tickers = pd.read_csv(os.path.join(store_dir, tickers_file_name))['Ticker'].astype(str).tolist()
+        moments.shift = np.load(os.path.join(store_dir, 'shift.npy'))
+        with open(os.path.join(store_dir, state_file_name)) as f:
+            moments.last_week = json.load(f)['last_week']
+        moments.last_values = np.load(os.path.join(store_dir, 'last_values.npy'))
+        moments.last_mask = np.load(os.path.join(store_dir, 'last_mask.npy'))
+        moments.matrices = {name: np.load(os.path.join(store_dir, name + '.npy'), mmap_mode='r+') for name in statistic_names}
+        return moments
+
+    def save(self, store_dir=None):
+        """
+        store_dir: string/None. Directory to write to, defaults to the store_dir of this PairwiseMoments
+        """
+        store_dir = self.store_dir if store_dir is None else store_dir
+        os.makedirs(store_dir, exist_ok=True)
+        for name, matrix in self.matrices.items():
+            if isinstance(matrix, np.memmap) and os.path.abspath(matrix.filename) == os.path.abspath(os.path.join(store_dir, name + '.npy')):
+                matrix.flush()
+            else:
+                np.save(os.path.join(store_dir, name + '.npy'), matrix)
+        np.save(os.path.join(store_dir, 'shift.npy'), self.shift)
+        np.save(os.path.join(store_dir, 'last_values.npy'), self.last_values)
+        np.save(os.path.join(store_dir, 'last_mask.npy'), self.last_mask)
+        pd.DataFrame({'Ticker': self.tickers}).to_csv(os.path.join(store_dir, tickers_file_name), index=False)
+        with open(os.path.join(store_dir, state_file_name), 'w') as f:
+            json.dump({'last_week': self.last_week}, f)
+
+    def grow(self, size):
+        """
+        size: int. The new number of tickers, the sums of the new tickers start at 0
+        """
+        old_size = len(self.shift)
+        for name, matrix in self.matrices.items():
+            if self.store_dir is None:
+                grown = np.zeros((size, size))
+            else:
+                os.makedirs(self.store_dir, exist_ok=True)
+                path = os.path.join(self.store_dir, name + '.npy')
+                temporary_path = path + '.grow.npy'
+                grown = np.lib.format.open_memmap(temporary_path, mode='w+', dtype='float64', shape=(size, size))
+            # Copy block by block so a memory-mapped matrix is never read in whole
+            for rows in blocks(old_size, self.block_size):
+                grown[rows, :old_size] = matrix[rows]
+            if self.store_dir is not None:
+                del matrix
+                grown.flush()
+                del grown
+                os.replace(temporary_path, path)
+                grown = np.load(path, mmap_mode='r+')
+            self.matrices[name] = grown
+
+    def add_weeks(self, values, mask, sign=1):
+        """
+        values: numpy array. (weeks x tickers) values, 0 where mask is False
+        mask: numpy array. (weeks x tickers) bool mask of the weeks each ticker has
+        sign: int. 1 adds the weeks to the sums, -1 takes them out again
+        """
+        weights = mask.astype('float64')
+        shifted = np.where(mask, values - self.shift, 0)
+        squares = np.square(shifted)
+        ticker_blocks = blocks(len(self.tickers), self.block_size)
+        for rows in ticker_blocks:
+            for columns in ticker_blocks:
+                # Four BLAS products per tile, every pair only counts the weeks both tickers have
+                self.matrices['n'][rows, columns] += sign * (weights[:, rows].T @ weights[:, columns])
+                self.matrices['sx'][rows, columns] += sign * (shifted[:, rows].T @ weights[:, columns])
+                self.matrices['sxx'][rows, columns] += sign * (squares[:, rows].T @ weights[:, columns])
+                self.matrices['sxy'][rows, columns] += sign * (shifted[:, rows].T @ shifted[:, columns])
+
+    def update(self, weeks, tickers, values, mask):
+        """
+        weeks: pd dataframe. Year | Week_Number of the rows of values, only last_week and the weeks after it are
+            added, so a ticker that first shows up in a later update only counts from then on. last_week may have
+            been stored before it closed, it replaces the stored one
+        tickers: list. Tickers of the columns of values, they start with self.tickers as returned by weekly_panel
+        values: numpy array. (weeks x tickers) values, 0 where mask is False
+        mask: numpy array. (weeks x tickers) bool mask of the weeks each ticker has
+        returns: int with the number of weeks added or replaced
+        """
+        week_labels = weeks['Year'].to_numpy().astype('int64') * 100 + weeks['Week_Number'].to_numpy().astype('int64')
+        if self.last_week is not None:
+            new_weeks = week_labels >= self.last_week
+            week_labels, values, mask = week_labels[new_weeks], values[new_weeks], mask[new_weeks]
+        if not len(week_labels):
+            return 0
+        if list(tickers[:len(self.tickers)]) != self.tickers:
+            raise ValueError('the panel has to start with the tickers already added, build it with weekly_panel(tickers=...)')
+        if len(tickers) > len(self.tickers):
+            # New tickers are shifted by the mean of their first weeks
+            counts = mask[:, len(self.tickers):].sum(axis=0)
+            first_means = values[:, len(self.tickers):].sum(axis=0) / np.maximum(counts, 1)
+            self.grow(len(tickers))
+            self.shift = np.concatenate([self.shift, first_means])
+            self.last_values = np.concatenate([self.last_values, np.zeros(len(tickers) - len(self.tickers))])
+            self.last_mask = np.concatenate([self.last_mask, np.zeros(len(tickers) - len(self.tickers), dtype=bool)])
+            self.tickers = list(tickers)
+
+        if self.last_week in week_labels:
+            # Take out the stored last week, the new panel has it again with any days added since
+            self.add_weeks(self.last_values[None], self.last_mask[None], -1)
+        self.add_weeks(values, mask)
+        last = np.argmax(week_labels)
+        self.last_week = int(week_labels[last])
+        self.last_values = values[last].copy()
+        self.last_mask = mask[last].copy()
+        if self.store_dir is not None:
+            self.save()
+        return len(week_labels)
+
+    def pairwise(self, statistic='correlation', min_periods=2, out=None):
+        """
+        statistic: string. correlation or covariance
+        min_periods: int. Fewest shared weeks for a value, pairs with fewer are NaN
+        out: numpy array/None. (tickers x tickers) array to write into, eg. an open_memmap, None allocates one
+        returns: (tickers x tickers) matrix of the pairwise correlation or sample covariance over the shared weeks
+        """
+        size = len(self.tickers)
+        out = np.empty((size, size)) if out is None else out
+        for rows in blocks(size, self.block_size):
+            for columns in blocks(size, self.block_size):
+                n = self.matrices['n'][rows, columns]
+                sx = self.matrices['sx'][rows, columns]
+                # The sum of the column ticker over the shared weeks is the transposed tile of sx
+                sy = self.matrices['sx'][columns, rows].T
+                with np.errstate(divide='ignore', invalid='ignore'):
+                    covariance = (self.matrices['sxy'][rows, columns] - sx * sy / n) / (n - 1)
+                    if statistic == 'correlation':
+                        variance_x = (self.matrices['sxx'][rows, columns] - sx * sx / n) / (n - 1)
+                        variance_y = (self.matrices['sxx'][columns, rows].T - sy * sy / n) / (n - 1)
+                        covariance = np.clip(covariance / np.sqrt(variance_x * variance_y), -1, 1)
+                out[rows, columns] = np.where(n >= max(min_periods, 2), covariance, np.nan)
+        return out
+
+
+def volatility_regimes(volatility, mask, n_regimes=3, iterations=100, seed=0):
+    """
+    volatility: numpy array. (weeks x tickers) weekly volatility
+    mask: numpy array. (weeks x tickers) bool mask of the weeks each ticker has
+    n_regimes: int. Number of regimes
+    iterations: int. Most k-means iterations
+    seed: int. Seed of the initial centers
+    returns: Tuple of the regime of every week (0 is the calmest, -1 for weeks without data) and a df with the
+        mean log volatility and cross ticker dispersion at the center of every regime
+    """
+    # Weeks with a single day have a volatility of 0 and say nothing about the regime
+    valid = mask & (volatility > 0)
+    counts = valid.sum(axis=1)
+    log_volatility = np.log(np.where(valid, volatility, 1))
+    with np.errstate(divide='ignore', invalid='ignore'):
+        level = np.where(valid, log_volatility, 0).sum(axis=1) / counts
+        dispersion = np.sqrt(np.maximum(np.where(valid, np.square(log_volatility - level[:, None]), 0).sum(axis=1) / counts, 0))
+    weeks = counts > 0
+    features = np.column_stack([level, dispersion])[weeks]
+    scale = features.std(axis=0)
+    scale[scale == 0] = 1
+    standardized = (features - features.mean(axis=0)) / scale
+
+    # k-means++ start, then Lloyd iterations on the (weeks x regimes) distance matrix
+    rng = np.random.default_rng(seed)
+    n_regimes = min(n_regimes, len(standardized))
+    centers = standardized[[rng.integers(len(standardized))]]
+    while len(centers) < n_regimes:
+        distances = np.min(np.square(standardized[:, None, :] - centers[None]).sum(axis=2), axis=1)
+        probabilities = distances / distances.sum() if distances.sum() > 0 else None
+        centers = np.vstack([centers, standardized[rng.choice(len(standardized), p=probabilities)]])
+    for _ in range(iterations):
+        assignment = np.argmin(np.square(standardized[:, None, :] - centers[None]).sum(axis=2), axis=1)
+        sizes = np.bincount(assignment, minlength=n_regimes)
+        sums = np.stack([np.bincount(assignment, standardized[:, column], minlength=n_regimes) for column in range(2)], axis=1)
+        new_centers = np.where(sizes[:, None] > 0, sums / np.maximum(sizes, 1)[:, None], centers)
+        if np.allclose(new_centers, centers):
+            break
+        centers = new_centers
+
+    # Number the regimes from the calmest to the most volatile
+    centers = centers * scale + features.mean(axis=0)
+    order = np.argsort(centers[:, 0])
+    rank = np.empty(n_regimes, dtype='int64')
+    rank[order] = np.arange(n_regimes)
+    regimes = np.full(len(counts), -1, dtype='int64')
+    regimes[weeks] = rank[assignment]
+    centers_table = pd.DataFrame(centers[order], columns=['mean_log_volatility', 'log_volatility_dispersion'])
+    centers_table.insert(0, 'Regime', np.arange(n_regimes))
+    centers_table['Weeks'] = np.bincount(regimes[weeks], minlength=n_regimes)
+    return regimes, centers_table
+
+
+def load_weekly_tables(paths):
+    """
+    paths: list of ticker csv files in the WMT.csv schema or weekly tables like WMT_weekly_return_volatility.csv,
+        the ticker is the file name without the extension and the _weekly_return_volatility suffix
+    returns: stacked weekly df: Ticker | Year | Week_Number | mean_return | volatility
+    """
+    frames = []
+    for path in paths:
+        ticker = os.path.splitext(os.path.basename(path))[0]
+        if ticker.endswith(weekly_table_suffix):
+            ticker = ticker[:-len(weekly_table_suffix)]
+        header = pd.read_csv(path, nrows=0).columns
+        weekly = pd.read_csv(path) if 'volatility' in header else weekly_return_volatility(load_ticker_csv(path))
+        frames.append(weekly[week_keys + ['mean_return', 'volatility']].assign(Ticker=ticker))
+    return pd.concat(frames, ignore_index=True)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description='Correlation and covariance of the weekly returns and volatility of many tickers, and volatility regimes.')
+    parser.add_argument('files', nargs='*', default=[ticker_file], help='ticker csv files or *_weekly_return_volatility.csv tables')
+    parser.add_argument('--value', choices=['mean_return', 'volatility'], default='mean_return', help='weekly column to correlate')
+    parser.add_argument('--block-size', type=int, default=1024, help='tickers per tile of the matrix products')
+    parser.add_argument('--min-periods', type=int, default=10, help='fewest shared weeks for a correlation')
+    parser.add_argument('--regimes', type=int, default=3, help='number of volatility regimes')
+    parser.add_argument('--store-dir', default=None, help='keep the pairwise sums here and only add the last stored week again and the weeks after it')
+    parser.add_argument('--output-dir', default='.', help='directory for the weekly_correlation/covariance and regime files')
+    args = parser.parse_args(argv)
+
+    weekly = load_weekly_tables(args.files)
+    if args.store_dir is not None and os.path.exists(os.path.join(args.store_dir, state_file_name)):
+        moments = PairwiseMoments.load(args.store_dir, args.block_size)
+    else:
+        moments = PairwiseMoments(args.store_dir, args.block_size)
+    weeks, tickers, values, mask = weekly_panel(weekly, args.value, moments.tickers)
+    added = moments.update(weeks, tickers, values, mask)
+    print('Added {} weeks for {} tickers'.format(added, len(moments.tickers)))
+
+    os.makedirs(args.output_dir, exist_ok=True)
+    for statistic in ['correlation', 'covariance']:
+        output_file = os.path.join(args.output_dir, 'weekly_{}_{}.npy'.format(args.value, statistic))
+        out = np.lib.format.open_memmap(output_file, mode='w+', dtype='float64', shape=(len(moments.tickers),) * 2)
+        moments.pairwise(statistic, args.min_periods, out)
+        out.flush()
+        if len(moments.tickers) <= 50:
+            print('Weekly {} {}'.format(args.value, statistic))
+            print(pd.DataFrame(np.asarray(out), index=moments.tickers, columns=moments.tickers).round(4))
+    pd.DataFrame({'Ticker': moments.tickers}).to_csv(os.path.join(args.output_dir, 'weekly_tickers.csv'), index=False)
+
+    volatility_weeks, _, volatility, volatility_mask = weekly_panel(weekly, 'volatility', moments.tickers)
+    regimes, centers = volatility_regimes(volatility, volatility_mask, args.regimes)
+    volatility_weeks['Regime'] = regimes
+    volatility_weeks.to_csv(os.path.join(args.output_dir, 'weekly_volatility_regimes.csv'), index=False)
+    print('Volatility regimes')
+    print(centers.round(4).to_string(index=False))
+
+
+if __name__ == "__main__":
+    main()
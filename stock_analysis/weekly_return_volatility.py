@@ -0,0 +1,281 @@
+# -*- coding: utf-8 -*-
+"""
+Created on Mon Mar 18 14:37:48 2019
+
+@author: epinsky
+@Modified: rwang
+"""
+
+import os
+import argparse
+import io
+import numpy as np 
+import pandas as pd
+from .loader import load_ticker_csv
+from .instrumentation import instrumented
+
+# This file has been updated with the weekly and daily volatility calculations
+
+ticker='WMT'
+ticker_file = './{}.csv'.format(ticker)
+output_file = '{}_weekly_return_volatility.csv'.format(ticker)
+week_keys = ['Year', 'Week_Number']
+
+
+@instrumented()
+def weekly_return_volatility(df, start_date=None, end_date=None):
+    """
+    df: pd dataframe. Data of interest with Date, Year, Week_Number and Adj Close columns
+    start_date: string/None. The first date to include, eg. '2014-01-01'
+    end_date: string/None. The last date to include, eg. '2018-12-31'
+    returns: df with the following columns: Year | Week_Number | mean_return | volatility
+    """
+    if start_date is not None:
+        df = df[df['Date'] >= start_date]
+    if end_date is not None:
+        df = df[df['Date'] <= end_date]
+    df = df.copy()
+    df['Return'] = df['Adj Close'].pct_change()
+    df['Return'] = df['Return'].fillna(0)
+    df['Return'] = 100.0 * df['Return']
+    df['Return'] = df['Return'].round(3)
+    df_2 = df[['Year', 'Week_Number', 'Return']]
+    df_2.index = range(len(df))
+    df_grouped = df_2.groupby(['Year', 'Week_Number'])['Return'].agg(['mean', 'std'])
+    df_grouped.reset_index(['Year', 'Week_Number'], inplace=True)
+    df_grouped.rename(columns={'mean': 'mean_return', 'std':'volatility'}, inplace=True)
+    df_grouped.fillna(0, inplace=True)
+    return df_grouped
+
+
+def daily_returns_from_adj_close(adj_close, previous_adj_close=None):
+    """
+    adj_close: pd series. Adjusted close prices in date order
+    previous_adj_close: float/None. The adjusted close before the first price, None if this is the first day
+    returns: Series of daily returns as a percentage rounded to 3 decimals, the first day is 0 without a previous close
+    """
+    previous = adj_close.shift(1)
+    if previous_adj_close is not None and len(previous):
+        previous.iloc[0] = previous_adj_close
+    returns = (adj_close / previous - 1).fillna(0)
+    return (100.0 * returns).round(3)
+
+
+@instrumented()
+def weekly_moments(df):
+    """
+    df: pd dataframe. Data of interest with Year, Week_Number and Return columns
+    returns: df indexed by Year and Week_Number with the count, mean and M2 (sum of squared deviations) of the returns
+    """
+    grouped = df.groupby(week_keys)['Return']
+    deviations = df['Return'] - grouped.transform('mean')
+    moments = grouped.agg(['count', 'mean'])
+    moments['M2'] = np.square(deviations).groupby([df[key] for key in week_keys]).sum()
+    return moments
+
+
+def merge_weekly_moments(moments_a, moments_b):
+    """
+    moments_a: df of weekly moments as returned by weekly_moments
+    moments_b: df of weekly moments as returned by weekly_moments
+    returns: df of the combined weekly moments, weeks in both inputs are merged with Chan's update of Welford's method
+    """
+    index = moments_a.index.union(moments_b.index)
+    a = moments_a.reindex(index, fill_value=0)
+    b = moments_b.reindex(index, fill_value=0)
+    count = a['count'] + b['count']
+    delta = b['mean'] - a['mean']
+    merged = pd.DataFrame(index=index)
+    merged['count'] = count
+    merged['mean'] = a['mean'] + delta * b['count'] / count
+    merged['M2'] = a['M2'] + b['M2'] + np.square(delta) * a['count'] * b['count'] / count
+    return merged
+
+
+def weekly_moments_to_volatility(moments):
+    """
+    moments: df of weekly moments as returned by weekly_moments
+    returns: df with the following columns: Year | Week_Number | mean_return | volatility
+    """
+    df_grouped = pd.DataFrame(index=moments.index)
+    df_grouped['mean_return'] = moments['mean']
+    # Sample standard deviation, weeks with a single day have no volatility
+    df_grouped['volatility'] = np.sqrt(moments['M2'] / (moments['count'] - 1).where(moments['count'] > 1)).fillna(0)
+    df_grouped = df_grouped.sort_index().reset_index()
+    df_grouped['Year'] = df_grouped['Year'].astype('int64')
+    df_grouped['Week_Number'] = df_grouped['Week_Number'].astype('int64')
+    return df_grouped
+
+
+def weekly_moments_chunked(ticker_file, start_date=None, end_date=None, chunksize=100000):
+    """
+    ticker_file: string. Path of a ticker csv in the WMT.csv schema, sorted by date
+    start_date: string/None. The first date to include, eg. '2014-01-01'
+    end_date: string/None. The last date to include, eg. '2018-12-31'
+    chunksize: int. Number of rows read at a time, memory is bounded by this and the number of weeks
+    returns: Tuple of the weekly moments df (None without any rows), the last date and the last adj close
+    """
+    moments = None
+    last_date = None
+    previous_adj_close = None
+    for chunk in pd.read_csv(ticker_file, usecols=['Date'] + week_keys + ['Adj Close'], chunksize=chunksize):
+        if start_date is not None:
+            chunk = chunk[chunk['Date'] >= start_date]
+        if end_date is not None:
+            chunk = chunk[chunk['Date'] <= end_date]
+        if chunk.empty:
+            continue
+        chunk = chunk.assign(Return=daily_returns_from_adj_close(chunk['Adj Close'], previous_adj_close))
+        # Carry the last price so the first return of the next chunk is not lost
+        previous_adj_close = chunk['Adj Close'].iloc[-1]
+        last_date = chunk['Date'].iloc[-1]
+        chunk_moments = weekly_moments(chunk)
+        moments = chunk_moments if moments is None else merge_weekly_moments(moments, chunk_moments)
+    return moments, last_date, previous_adj_close
+
+
+def weekly_return_volatility_chunked(ticker_file, start_date=None, end_date=None, chunksize=100000):
+    """
+    ticker_file: string. Path of a ticker csv in the WMT.csv schema, sorted by date
+    start_date: string/None. The first date to include, eg. '2014-01-01'
+    end_date: string/None. The last date to include, eg. '2018-12-31'
+    chunksize: int. Number of rows read at a time, memory is bounded by this and the number of weeks
+    returns: df with the following columns: Year | Week_Number | mean_return | volatility
+    """
+    moments, _, _ = weekly_moments_chunked(ticker_file, start_date, end_date, chunksize)
+    if moments is None:
+        return pd.DataFrame(columns=week_keys + ['mean_return', 'volatility'])
+    return weekly_moments_to_volatility(moments)
+
+
+def read_csv_rows_after_date(ticker_file, last_date, block_size=65536):
+    """
+    ticker_file: string. Path of a ticker csv sorted by an ISO formatted Date column
+    last_date: string. Only rows with a later date are returned
+    block_size: int. Number of bytes read at a time from the end of the file
+    returns: df of the rows after last_date, found by reading the file backwards from its end
+    """
+    with open(ticker_file, 'rb') as f:
+        header = f.readline()
+        date_column = header.decode().strip().split(',').index('Date')
+        data_start = f.tell()
+        position = f.seek(0, os.SEEK_END)
+        tail = b''
+        lines = []
+        while position > data_start:
+            read_size = min(block_size, position - data_start)
+            position -= read_size
+            f.seek(position)
+            tail = f.read(read_size) + tail
+            lines = tail.splitlines()
+            # The first line is only complete once we have read back to the start of the data
+            complete_lines = [line for line in (lines if position == data_start else lines[1:]) if line.strip()]
+            if complete_lines and complete_lines[0].decode().split(',')[date_column] <= last_date:
+                lines = complete_lines
+                break
+            lines = complete_lines
+    new_lines = [line for line in lines if line.decode().split(',')[date_column] > last_date]
+    return pd.read_csv(io.BytesIO(header + b'\n'.join(new_lines)))
+
+
+def state_file_for(output_file):
+    """
+    output_file: string. Path of a weekly return volatility csv
+    returns: string with the path of the state file kept next to it for incremental updates
+    """
+    return '{}_state.csv'.format(os.path.splitext(output_file)[0])
+
+
+def stored_date(value):
+    """
+    value: a Start_Date/End_Date value read back from a state file
+    returns: string date or None when the range is open
+    """
+    return None if pd.isna(value) else str(value)
+
+
+def update_weekly_return_volatility(ticker_file, output_file, start_date=None, end_date=None, chunksize=100000):
+    """
+    ticker_file: string. Path of a ticker csv in the WMT.csv schema, sorted by date
+    output_file: string. Path of the weekly return volatility csv to create or update
+    start_date: string/None. The first date to include, eg. '2014-01-01'
+    end_date: string/None. The last date to include, eg. '2018-12-31', None to keep adding new days
+    chunksize: int. Number of rows read at a time when the output is built from scratch
+    returns: int with the number of weekly rows written
+
+    The state file keeps the date range, the last date and Adj Close, the running moments of the last
+    (open) week and the byte offset of its row in the output, so an update only reads the new price rows
+    and rewrites the open week plus any new weeks. A different date range than the stored one rebuilds the output.
+    """
+    state_file = state_file_for(output_file)
+    state = pd.read_csv(state_file).iloc[0] if os.path.exists(state_file) and os.path.exists(output_file) else None
+    if state is not None and (stored_date(state.get('Start_Date')), stored_date(state.get('End_Date'))) != (start_date, end_date):
+        state = None
+    if state is not None:
+        df_new = read_csv_rows_after_date(ticker_file, state['Last_Date'])
+        if end_date is not None:
+            df_new = df_new[df_new['Date'] <= end_date]
+        if df_new.empty:
+            return 0
+        df_new = df_new.assign(Return=daily_returns_from_adj_close(df_new['Adj Close'], state['Last_Adj_Close']))
+        open_week = pd.DataFrame({'count': [state['count']], 'mean': [state['mean']], 'M2': [state['M2']]},
+            index=pd.MultiIndex.from_tuples([(int(state['Year']), int(state['Week_Number']))], names=week_keys))
+        moments = merge_weekly_moments(open_week, weekly_moments(df_new))
+        last_date = df_new['Date'].iloc[-1]
+        last_adj_close = df_new['Adj Close'].iloc[-1]
+        offset = int(state['Offset'])
+        header = False
+    else:
+        moments, last_date, last_adj_close = weekly_moments_chunked(ticker_file, start_date, end_date, chunksize)
+        if moments is None:
+            return 0
+        offset = 0
+        header = True
+
+    df_grouped = weekly_moments_to_volatility(moments)
+    rows_text = df_grouped.to_csv(index=False, header=header).encode()
+    last_row_text = df_grouped.tail(1).to_csv(index=False, header=False).encode()
+    with open(output_file, 'r+b' if header is False else 'wb') as f:
+        # Drop the old row of the open week and everything after it, then write the updated weeks
+        f.seek(offset)
+        f.truncate()
+        f.write(rows_text)
+        open_week_offset = f.tell() - len(last_row_text)
+
+    moments = moments.sort_index()
+    open_week = moments.iloc[-1]
+    year, week_number = moments.index[-1]
+    pd.DataFrame({'Start_Date': [start_date], 'End_Date': [end_date], 'Last_Date': [last_date], 'Last_Adj_Close': [last_adj_close], 'Year': [year], 'Week_Number': [week_number],
+        'count': [open_week['count']], 'mean': [open_week['mean']], 'M2': [open_week['M2']], 'Offset': [open_week_offset]}).to_csv(state_file, index=False)
+    return len(df_grouped)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description='Calculate the weekly mean return and volatility for a ticker.')
+    parser.add_argument('--file', default=ticker_file, help='ticker csv to analyze, defaults to %(default)s')
+    parser.add_argument('--output', default=output_file, help='weekly csv to write, defaults to %(default)s')
+    parser.add_argument('--chunksize', type=int, default=None, help='stream the csv in chunks of this many rows instead of loading it at once')
+    parser.add_argument('--incremental', action='store_true', help='only process price rows added since the last run and update the open week')
+    parser.add_argument('--start', default='2014-01-01', help='first date, defaults to %(default)s')
+    parser.add_argument('--end', default=None, help='last date, defaults to 2018-12-31, or open with --incremental so new days are added')
+    args = parser.parse_args(argv)
+    try:
+        start_date = args.start
+        end_date = args.end if args.end is not None or args.incremental else '2018-12-31'
+        if args.incremental:
+            rows = update_weekly_return_volatility(args.file, args.output, start_date, end_date, args.chunksize or 100000)
+            print('Updated {} weeks in {}'.format(rows, args.output))
+            return
+        if args.chunksize:
+            df_grouped = weekly_return_volatility_chunked(args.file, start_date, end_date, args.chunksize)
+        else:
+            df = load_ticker_csv(args.file)
+            df_grouped = weekly_return_volatility(df, start_date, end_date)
+        df_grouped.to_csv(args.output, index=False)
+
+    except Exception as e:
+        print(e)
+
+
+if __name__ == "__main__":
+    main()
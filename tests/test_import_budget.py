@@ -0,0 +1,25 @@
+# -*- coding: utf-8 -*-
+"""
+@author: rwang
+"""
+import pytest
+from stock_analysis.benchmark import check_import_budget, import_budget_modules, measure_cold_imports
+
+# Most seconds a fresh interpreter may take to import the cli and a non-plotting command, pandas alone is
+# most of it, matplotlib is checked separately
+import_budget = 3.0
+
+
+@pytest.fixture(scope='module')
+def import_results():
+    return {result['module']: result for result in measure_cold_imports()}
+
+
+@pytest.mark.parametrize('module', import_budget_modules)
+def test_command_does_not_import_matplotlib(import_results, module):
+    assert not import_results[module]['matplotlib']
+
+
+@pytest.mark.parametrize('module', import_budget_modules)
+def test_command_imports_within_budget(import_results, module):
+    assert check_import_budget([import_results[module]], import_budget) == []
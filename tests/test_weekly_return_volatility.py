@@ -0,0 +1,42 @@
+# -*- coding: utf-8 -*-
+"""
+@author: rwang
+"""
+import os
+import numpy as np
+import pandas as pd
+import pytest
+from stock_analysis.loader import load_ticker_csv
+from stock_analysis.weekly_return_volatility import (update_weekly_return_volatility, weekly_return_volatility,
+    weekly_return_volatility_chunked)
+
+ticker_file = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'WMT.csv')
+start_date = '2014-01-01'
+
+
+def assert_same_weeks(actual, expected):
+    assert actual[['Year', 'Week_Number']].to_numpy().tolist() == expected[['Year', 'Week_Number']].to_numpy().tolist()
+    np.testing.assert_allclose(actual[['mean_return', 'volatility']].to_numpy(), expected[['mean_return', 'volatility']].to_numpy(),
+        rtol=1e-12, atol=1e-12)
+
+
+@pytest.mark.parametrize('chunksize', [1, 7, 100, 10 ** 6])
+def test_chunked_matches_in_memory(tmp_path, chunksize):
+    # A year of prices keeps chunks of one row fast, the dates cut weeks at both ends
+    short_file = str(tmp_path / 'WMT.csv')
+    pd.read_csv(ticker_file).iloc[:300].to_csv(short_file, index=False)
+    expected = weekly_return_volatility(load_ticker_csv(short_file, use_cache=False), '2014-03-05', '2014-11-20')
+    actual = weekly_return_volatility_chunked(short_file, '2014-03-05', '2014-11-20', chunksize)
+    assert_same_weeks(actual.reset_index(drop=True), expected.reset_index(drop=True))
+
+
+def test_incremental_matches_full_rebuild(tmp_path):
+    prices = pd.read_csv(ticker_file)
+    growing_file = str(tmp_path / 'WMT.csv')
+    output_file = str(tmp_path / 'WMT_weekly_return_volatility.csv')
+    # Cut the file in the middle of weeks and append the rest in pieces, like daily downloads
+    for rows in [700, 703, 704, 1000, len(prices)]:
+        prices.iloc[:rows].to_csv(growing_file, index=False)
+        update_weekly_return_volatility(growing_file, output_file, start_date)
+    expected = weekly_return_volatility(load_ticker_csv(ticker_file, use_cache=False), start_date)
+    assert_same_weeks(pd.read_csv(output_file), expected.reset_index(drop=True))